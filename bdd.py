@@ -0,0 +1,448 @@
+#!/usr/bin/env python3
+
+from itertools import product
+from boolean import TRUE, FALSE, CONSTANTS, NOT, AND, OR, XOR, IF, IFF
+from expression import Expression, DAG
+
+__all__ = ['BDD', 'dfs_order', 'count_models', 'column_counts']
+
+# Level of the terminal nodes, below every variable
+TERMINAL = float('inf')
+
+# Growth of the diagram, relative to the smallest size found, at which
+# BDD.sift stops moving a variable further in the same direction
+MAX_GROWTH = 1.2
+
+
+class BDD(object):
+    """Manager of reduced ordered binary decision diagrams.
+
+    A node is an integer: 0 and 1 are the FALSE and TRUE terminals, any other
+    node tests the variable of its level and continues with its low child when
+    the variable is FALSE and its high child when it is TRUE. Nodes are
+    hash-consed in a unique table, so two functions built by the same manager
+    are equivalent exactly when they are the same node.
+
+    Every operation goes through ite, if-then-else, whose results are kept in
+    a direct mapped cache of cache_size entries: a new result replaces the
+    one in its slot, which bounds the memory of the cache.
+
+    order - the variable names by level, from the root. Variables that are
+        not in it are appended when first seen.
+
+    Examples:
+        >>> a, b = Expression(' ', 'a'), Expression(' ', 'b')
+        >>> bdd = BDD()
+        >>> f = bdd.add(Expression('=>', a, b))
+        >>> f == bdd.add(Expression('|', Expression('~', a), b))
+        True
+        >>> f == bdd.add(Expression('=>', b, a))
+        False
+        >>> bdd.order, bdd.size(f)
+        (['a', 'b'], 2)
+        >>> for row in bdd.truth_table(f):
+        ...     print(row)
+        ['T', 'T', 'T']
+        ['T', 'F', 'F']
+        ['F', 'T', 'T']
+        ['F', 'F', 'T']
+    """
+
+    def __init__(self, order=(), cache_size=2 ** 16):
+        self.order = []
+        self._levels = {}
+        self.nodes = [(TERMINAL, 0, 0), (TERMINAL, 1, 1)]
+        self._unique = {}
+        self._cache = [None] * cache_size
+        for name in order:
+            self._level(name)
+
+    def __len__(self):
+        return len(self.nodes)
+
+    def _level(self, name):
+        try:
+            return self._levels[name]
+        except KeyError:
+            self._levels[name] = len(self.order)
+            self.order.append(name)
+            return len(self.order) - 1
+
+    def level(self, node):
+        """Returns the level of the variable tested by node."""
+        return self.nodes[node][0]
+
+    def low(self, node):
+        return self.nodes[node][1]
+
+    def high(self, node):
+        return self.nodes[node][2]
+
+    def var(self, name):
+        """Returns the node of the variable name."""
+        return self._node(self._level(name), 0, 1)
+
+    def _node(self, level, low, high):
+        if low == high:
+            return low
+        key = (level, low, high)
+        try:
+            return self._unique[key]
+        except KeyError:
+            self._unique[key] = len(self.nodes)
+            self.nodes.append(key)
+            return len(self.nodes) - 1
+
+    def ite(self, f, g, h):
+        """Returns the node of: if f then g else h."""
+        if f == 1:
+            return g
+        if f == 0 or g == h:
+            return h
+        if g == 1 and h == 0:
+            return f
+
+        key = (f, g, h)
+        slot = hash(key) % len(self._cache)
+        entry = self._cache[slot]
+        if entry is not None and entry[0] == key:
+            return entry[1]
+
+        nodes = self.nodes
+        top = min(nodes[f][0], nodes[g][0], nodes[h][0])
+        cofactors = []
+        for node in (f, g, h):
+            level, low, high = nodes[node]
+            cofactors.append((low, high) if level == top else (node, node))
+        (f0, f1), (g0, g1), (h0, h1) = cofactors
+        result = self._node(top, self.ite(f0, g0, h0), self.ite(f1, g1, h1))
+        self._cache[slot] = (key, result)
+        return result
+
+    def apply(self, oper, f, g=None):
+        """Returns the node of the operator oper of boolean applied to f, and
+        g for binary operators."""
+        if oper == NOT:
+            return self.ite(f, 0, 1)
+        elif oper == AND:
+            return self.ite(f, g, 0)
+        elif oper == OR:
+            return self.ite(f, 1, g)
+        elif oper == XOR:
+            return self.ite(f, self.ite(g, 0, 1), g)
+        elif oper == IF:
+            return self.ite(f, g, 1)
+        elif oper == IFF:
+            return self.ite(f, g, self.ite(g, 0, 1))
+        raise ValueError('unknown operator: {}'.format(oper))
+
+    def add(self, expr):
+        """Builds the diagram of expr. Returns its node."""
+        return self.add_all(expr)[-1]
+
+    def add_all(self, expr):
+        """Builds the diagram of expr and of each of its subexpressions.
+        Returns their nodes in the order of the head of TruthTable(expr)."""
+        dag = DAG()
+        nodes = {}
+        for node_id in dag.order(dag.add(expr)):
+            oper, arg1, arg2 = dag.nodes[node_id]
+            args = [nodes[arg] for arg in dag.args[node_id]]
+            if args:
+                nodes[node_id] = self.apply(oper, *args)
+            elif arg1 in CONSTANTS:
+                nodes[node_id] = 1 if arg1 == TRUE else 0
+            else:
+                nodes[node_id] = self.var(arg1)
+        return list(nodes.values())
+
+    def reachable(self, *roots):
+        """Returns the set of internal nodes reachable from roots."""
+        found = set()
+        stack = [node for node in roots if node > 1]
+        while stack:
+            node = stack.pop()
+            if node in found:
+                continue
+            found.add(node)
+            stack.extend(child for child in self.nodes[node][1:]
+                         if child > 1)
+        return found
+
+    def size(self, *roots):
+        """Returns the number of internal nodes reachable from roots."""
+        return len(self.reachable(*roots))
+
+    def count(self, node, num_vars=None):
+        """Returns the number of assignments to the first num_vars variables
+        of the order, all of them by default, that make node TRUE. node must
+        not depend on the other variables.
+
+        The count of a node is computed once from the counts of its children,
+        doubled for every level skipped between them.
+        """
+        if num_vars is None:
+            num_vars = len(self.order)
+        level = lambda node: min(self.nodes[node][0], num_vars)
+        counts = {0: 0, 1: 1}
+        for internal in sorted(self.reachable(node), key=level, reverse=True):
+            top, low, high = self.nodes[internal]
+            counts[internal] = ((counts[low] << (level(low) - top - 1)) +
+                    (counts[high] << (level(high) - top - 1)))
+        return counts[node] << level(node)
+
+    def evaluate(self, node, mappings):
+        """Returns the value, TRUE or FALSE, of node when the variables have
+        the values in mappings."""
+        while node > 1:
+            level, low, high = self.nodes[node]
+            node = high if mappings[self.order[level]] == TRUE else low
+        return TRUE if node else FALSE
+
+    def truth_table(self, node, variables=None):
+        """Yields the rows of the truth table of node, the values of
+        variables followed by the value of node, in the row order of
+        TruthTable. variables defaults to the sorted variables of the
+        manager.
+
+        Each row costs at most one step per variable, so the time is
+        proportional to the size of the table."""
+        if variables is None:
+            variables = sorted(self.order)
+        for values in product(CONSTANTS, repeat=len(variables)):
+            row = list(values)
+            row.append(self.evaluate(node, dict(zip(variables, values))))
+            yield row
+
+    def sift(self, roots, max_growth=MAX_GROWTH):
+        """Looks for a variable order giving fewer nodes for roots by moving
+        each variable, from the one with the most nodes, through every level
+        while keeping the others in place, then back to the level where the
+        diagram was smallest. Returns the best manager found and the nodes
+        of roots in it, which may be self and roots.
+
+        The variables move by swapping adjacent levels in a copy of the
+        diagram, which only rewrites the nodes of those two levels. A
+        variable stops moving in a direction once the diagram has grown to
+        max_growth times the best size found.
+
+        Examples:
+            >>> x = lambda name: Expression(' ', name)
+            >>> expr = Expression('|', Expression('|',
+            ...     Expression('&', x('a'), x('b')),
+            ...     Expression('&', x('c'), x('d'))),
+            ...     Expression('&', x('e'), x('f')))
+            >>> bdd = BDD('acebdf')
+            >>> f = bdd.add(expr)
+            >>> sifted, [g] = bdd.sift([f])
+            >>> bdd.size(f), sifted.size(g), ''.join(sifted.order)
+            (14, 6, 'abcdef')
+            >>> sifted.add(expr) == g
+            True
+        """
+        roots = list(roots)
+        size = self.size(*roots)
+        sifter = _Sifter(self, roots)
+        counts = [len(nodes) for nodes in sifter.levels]
+        names = sorted(self.order, key=lambda name: counts[self._levels[
+            name]], reverse=True)
+        for name in names:
+            if counts[self._levels[name]]:
+                sifter.sift(sifter.order.index(name), max_growth)
+        if sifter.size >= size:
+            return self, roots
+        return sifter.manager(len(self._cache))
+
+
+class _Sifter(object):
+    # A copy of the diagram of roots in which adjacent levels are swapped in
+    # place, keeping the number of references to each node so that the
+    # nodes no longer used are dropped and the size is always known.
+
+    def __init__(self, bdd, roots):
+        self.order = list(bdd.order)
+        self.nodes = [(TERMINAL, 0, 0), (TERMINAL, 1, 1)]
+        self.refs = [0, 0]
+        self.unique = {}
+        self.levels = [set() for name in self.order]
+        self.size = 0
+        copied = {0: 0, 1: 1}
+        for node in sorted(bdd.reachable(*roots), key=bdd.level,
+                           reverse=True):
+            level, low, high = bdd.nodes[node]
+            copied[node] = self._node(level, copied[low], copied[high])
+        self.roots = [copied[node] for node in roots]
+        for node in self.roots:
+            self._ref(node)
+
+    def _ref(self, node):
+        if node > 1:
+            self.refs[node] += 1
+
+    def _deref(self, node):
+        # Drops the references of node, and of the nodes only it used.
+        stack = [node]
+        while stack:
+            node = stack.pop()
+            if node <= 1:
+                continue
+            self.refs[node] -= 1
+            if self.refs[node] == 0:
+                level, low, high = self.nodes[node]
+                del self.unique[self.nodes[node]]
+                self.levels[level].discard(node)
+                self.size -= 1
+                stack.extend((low, high))
+
+    def _node(self, level, low, high):
+        # The node (level, low, high), created without any reference.
+        if low == high:
+            return low
+        key = (level, low, high)
+        node = self.unique.get(key)
+        if node is None:
+            node = len(self.nodes)
+            self.nodes.append(key)
+            self.refs.append(0)
+            self.unique[key] = node
+            self.levels[level].add(node)
+            self.size += 1
+            self._ref(low)
+            self._ref(high)
+        return node
+
+    def _relabel(self, node, level):
+        self.nodes[node] = (level,) + self.nodes[node][1:]
+        self.unique[self.nodes[node]] = node
+        self.levels[level].add(node)
+
+    def swap(self, level):
+        """Swaps the variables at level and level + 1, keeping every node
+        the same function."""
+        below = level + 1
+        upper, lower = self.levels[level], self.levels[below]
+        self.levels[level], self.levels[below] = set(), set()
+        self.order[level], self.order[below] = (self.order[below],
+                                                self.order[level])
+        # The nodes of the lower variable do not depend on the upper one,
+        # they move up unchanged, and so do down the nodes of the upper
+        # variable not depending on the lower one. Their keys are removed
+        # first since an old key may be the new key of another node.
+        for node in upper | lower:
+            del self.unique[self.nodes[node]]
+        for node in lower:
+            self._relabel(node, level)
+        rewritten = []
+        for node in upper:
+            f, low, high = self.nodes[node]
+            if low in lower or high in lower:
+                rewritten.append(node)
+            else:
+                self._relabel(node, below)
+
+        for node in rewritten:
+            f, low, high = self.nodes[node]
+            f00, f01 = self.nodes[low][1:] if low in lower else (low, low)
+            f10, f11 = self.nodes[high][1:] if high in lower else (high,
+                                                                   high)
+            new_low = self._node(below, f00, f10)
+            new_high = self._node(below, f01, f11)
+            self._ref(new_low)
+            self._ref(new_high)
+            self.nodes[node] = (level, new_low, new_high)
+            self.unique[self.nodes[node]] = node
+            self.levels[level].add(node)
+            self._deref(low)
+            self._deref(high)
+
+    def sift(self, level, max_growth):
+        """Moves the variable at level down to the last level then up to
+        the first, and leaves it where the diagram was the smallest. Each
+        pass starts from the best level found so far."""
+        best_size, best_level = self.size, level
+        for direction, last in ((1, len(self.order) - 1), (-1, 0)):
+            level = self._move(level, best_level)
+            while level != last and self.size <= max_growth * best_size:
+                self.swap(min(level, level + direction))
+                level += direction
+                if self.size < best_size:
+                    best_size, best_level = self.size, level
+        self._move(level, best_level)
+
+    def _move(self, level, target):
+        # Moves the variable at level to target, returns target.
+        while level < target:
+            self.swap(level)
+            level += 1
+        while level > target:
+            self.swap(level - 1)
+            level -= 1
+        return target
+
+    def manager(self, cache_size):
+        """Returns a new BDD with the diagram of the roots, and their nodes
+        in it."""
+        bdd = BDD(self.order, cache_size)
+        copied = {0: 0, 1: 1}
+        reachable = set()
+        stack = [node for node in self.roots if node > 1]
+        while stack:
+            node = stack.pop()
+            if node not in reachable:
+                reachable.add(node)
+                stack.extend(child for child in self.nodes[node][1:]
+                             if child > 1)
+        for node in sorted(reachable, key=lambda node: self.nodes[node][0],
+                           reverse=True):
+            level, low, high = self.nodes[node]
+            copied[node] = bdd._node(level, copied[low], copied[high])
+        return bdd, [copied[node] for node in self.roots]
+
+
+def dfs_order(expr):
+    """Static variable order: the variables in the order a depth first
+    traversal of expr meets them, which keeps related variables close.
+
+    >>> expr = Expression('|', Expression('&', 'x', 'a'), 'b')
+    >>> dfs_order(expr)
+    ['x', 'a', 'b']
+    """
+    dag = DAG()
+    order = []
+    seen = set()
+    for node_id in dag.order(dag.add(expr)):
+        oper, arg1, arg2 = dag.nodes[node_id]
+        if (not dag.args[node_id] and arg1 not in CONSTANTS and
+                arg1 not in seen):
+            seen.add(arg1)
+            order.append(arg1)
+    return order
+
+
+def count_models(expr):
+    """Returns the number of assignments to the variables of expr that make
+    it TRUE, without enumerating them.
+
+    >>> x = lambda name: Expression(' ', name)
+    >>> count_models(Expression('|', x('a'), x('b')))
+    3
+    >>> chain = x('v0')
+    >>> for i in range(1, 60):
+    ...     chain = Expression('^', chain, x('v{}'.format(i)))
+    >>> count_models(chain) == 2 ** 59
+    True
+    """
+    return column_counts(expr)[-1]
+
+
+def column_counts(expr):
+    """Returns the number of rows in which each formula of the truth table of
+    expr is TRUE, in the order of the head of TruthTable(expr). Same as
+    TruthTable(expr).counts() without enumerating the rows.
+
+    >>> a, b = Expression(' ', 'a'), Expression(' ', 'b')
+    >>> column_counts(Expression('=>', a, Expression('&', a, b)))
+    [2, 2, 1, 3]
+    """
+    bdd = BDD(dfs_order(expr))
+    return [bdd.count(node) for node in bdd.add_all(expr)]
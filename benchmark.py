@@ -0,0 +1,371 @@
+#!/usr/bin/env python3
+
+import contextlib
+import itertools
+import json
+import os
+import platform
+import random
+import sys
+import time
+import parser
+from string import ascii_lowercase
+from boolean import (bool_funcs_dict, BINARY, CONSTANTS, NOOP, NOT,
+                     OPERATORS, PRECEDENCE)
+from bool_parser import parse, parse_pyparsing
+from expression import Expression, simulate
+from truthtable import TruthTable
+
+# Number of operators of the formulas parsed by benchmark_parser
+SIZES = (10, 100, 1000)
+
+# Parameters of the formulas of run_suite, each series varying one of them
+DEFAULTS = {'size': 100, 'depth': None, 'variables': 6}
+SERIES = {
+        'size': (10, 100, 1000),
+        'depth': (7, 15, 100),
+        'variables': (4, 8, 12)}
+
+# Operators and parentheses as given to parser.parse
+OPERATION = {'unary': (NOT,), 'binary': BINARY,
+             'parenthesis': {'(': ')'}}
+PRECED = {oper: level for level, opers in enumerate(PRECEDENCE)
+          for oper in opers}
+TOKENS = frozenset(OPERATORS + ('(', ')'))
+
+# Shortest time, in seconds, over which a stage is run in a loop so that
+# the time of one run is not lost in the resolution of the clock
+MIN_TIME = 0.01
+
+# Slowdown, relative to the baseline, above which compare reports a stage
+THRESHOLD = 0.25
+
+
+def random_formula(size, rng=random, variables='abcdef'):
+    """Returns a random formula of size binary operators as a string, with
+    negations and parentheses mixed in."""
+    parts = [rng.choice(variables)]
+    opened = 0
+    for i in range(size):
+        parts.append(' {} '.format(rng.choice(BINARY)))
+        if rng.random() < 0.3:
+            parts.append('(')
+            opened += 1
+        if rng.random() < 0.2:
+            parts.append('~')
+        parts.append(rng.choice(variables))
+        if opened and rng.random() < 0.3:
+            parts.append(')')
+            opened -= 1
+    parts.append(')' * opened)
+    return ''.join(parts)
+
+
+def variable_names(count):
+    """Returns count distinct variable names: a to z, then aa, ab and so
+    on.
+
+    >>> variable_names(3), variable_names(28)[-2:]
+    (['a', 'b', 'c'], ['aa', 'ab'])
+    """
+    names = []
+    for length in itertools.count(1):
+        for letters in itertools.product(ascii_lowercase,
+                                         repeat=length):
+            if len(names) == count:
+                return names
+            names.append(''.join(letters))
+
+
+def random_expression(size, depth=None, variables=6, weights=None,
+                      negation=0.2, rng=random):
+    """Returns a random Expression of size binary operators, nested at most
+    depth deep, None for no limit, over the first variables of
+    variable_names.
+
+    weights - the relative frequency of each binary operator, a dictionary
+        mapping operators of BINARY to numbers, all equally frequent by
+        default.
+    negation - the probability of negating each operand.
+
+    The formula is built from the root, splitting the operators left to
+    its operands at random between them, as allowed by the depth.
+
+    Examples:
+        >>> rng = random.Random(0)
+        >>> expr = random_expression(7, depth=3, variables=3, rng=rng)
+        >>> print(expr)
+        ~(((b ^ b) & (a | b)) => ((c <=> ~c) | (b <=> c)))
+        >>> parse(str(expr)) == expr
+        True
+        >>> random_expression(8, depth=3)
+        Traceback (most recent call last):
+            ...
+        ValueError: 8 operators do not fit in depth 3
+    """
+    if depth is not None and size > 2 ** depth - 1:
+        raise ValueError('{} operators do not fit in depth {}'.format(size,
+                         depth))
+    if weights is None:
+        weights = dict.fromkeys(BINARY, 1)
+    opers = list(weights)
+    cum_weights = list(itertools.accumulate(weights[oper] for oper in opers))
+    names = variable_names(variables)
+
+    def negated(expr):
+        if rng.random() < negation:
+            return Expression(NOT, expr)
+        return expr
+
+    # Built iteratively, the operands of a node being built before it: an
+    # item is the number of operators and the depth of an operand, or None
+    # and the operator of a node whose operands are on top of values.
+    stack = [(size, depth)]
+    values = []
+    while stack:
+        count, arg = stack.pop()
+        if count is None:
+            y = values.pop()
+            x = values.pop()
+            values.append(negated(Expression(arg, x, y)))
+        elif count == 0:
+            values.append(negated(Expression(NOOP, rng.choice(names))))
+        else:
+            # the operators of the first operand, leaving the rest to the
+            # second one, neither of them exceeding the depth
+            low, high = 0, count - 1
+            if arg is not None:
+                arg -= 1
+                low = max(low, count - 1 - (2 ** arg - 1))
+                high = min(high, 2 ** arg - 1)
+            left = rng.randint(low, high)
+            oper = rng.choices(opers, cum_weights=cum_weights)[0]
+            stack.append((None, oper))
+            stack.append((count - 1 - left, arg))
+            stack.append((left, arg))
+    return values.pop()
+
+
+def best_time(func, arg, repeat=3):
+    # The shortest of repeat runs, the least disturbed by other processes.
+    times = []
+    for i in range(repeat):
+        start = time.perf_counter()
+        func(arg)
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def stage_time(func, arg, repeat=3, min_time=MIN_TIME):
+    """Returns the time of one call of func(arg), the best of repeat
+    measures, each running func in a loop for at least min_time seconds."""
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for i in range(number):
+            func(arg)
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time:
+            break
+        number *= 2
+    times = [elapsed]
+    for run in range(repeat - 1):
+        start = time.perf_counter()
+        for i in range(number):
+            func(arg)
+        times.append(time.perf_counter() - start)
+    return min(times) / number
+
+
+def _display_table(table):
+    with open(os.devnull, 'w') as devnull:
+        with contextlib.redirect_stdout(devnull):
+            table.display_table()
+
+
+def _flatten(formula):
+    # parser.parse does not support nested parentheses: the same operators
+    # and operands without any
+    return formula.replace('(', '').replace(')', '')
+
+
+def _simulate_input(formula):
+    # The evaluation order and a value for every variable
+    order = parse(formula).evaluation_order()
+    names = [expr.arg1 for expr in order if expr.is_leaf()]
+    return order, dict.fromkeys(names, CONSTANTS[0])
+
+
+# The stages timed by run_suite, in the order of the pipeline. Each takes
+# the input given by its setup function from the string of the formula.
+STAGES = (
+        ('tokenize', lambda s: list(parser.Tokenizer(s, TOKENS)), str),
+        ('parser.parse', lambda s: parser.parse(s, OPERATION, PRECED),
+         _flatten),
+        ('bool_parser.parse', parse, str),
+        ('evaluation_order', Expression.evaluation_order, parse),
+        ('simulate', lambda args: simulate(*args, funcs=bool_funcs_dict),
+         _simulate_input),
+        ('generate', TruthTable.generate, lambda s: TruthTable(parse(s))),
+        ('display_table', _display_table, lambda s: TruthTable(parse(s))))
+
+# Stages that may reject a formula, which run_stages records as None
+FALLIBLE = frozenset(['parser.parse'])
+
+
+def run_stages(formula, stages=None, repeat=3, min_time=MIN_TIME):
+    """Returns a dictionary mapping the name of each of stages, all of STAGES
+    by default, to the time of one run on the string formula. A stage of
+    FALLIBLE failing on the formula gets None, any other error is raised."""
+    times = {}
+    for name, func, setup in STAGES:
+        if stages is not None and name not in stages:
+            continue
+        arg = setup(formula)
+        if name in FALLIBLE:
+            try:
+                func(arg)
+            except (SyntaxError, LookupError):
+                times[name] = None
+                continue
+        times[name] = stage_time(func, arg, repeat, min_time)
+    return times
+
+
+def run_suite(series=SERIES, stages=None, seed=0, repeat=5,
+              min_time=MIN_TIME):
+    """Times the stages on a random formula for each point of series, a
+    dictionary mapping a parameter of random_expression to the values it
+    takes, the other parameters being those of DEFAULTS.
+
+    Returns the results as a dictionary that can be written as JSON, with
+    the times under 'series', by series then value then stage, e.g.
+    results['series']['size']['100']['generate'].
+    """
+    rng = random.Random(seed)
+    results = {'python': platform.python_version(),
+               'machine': platform.machine(), 'seed': seed,
+               'defaults': DEFAULTS, 'series': {}}
+    for param, values in series.items():
+        points = results['series'][param] = {}
+        for value in values:
+            params = dict(DEFAULTS)
+            params[param] = value
+            formula = str(random_expression(rng=rng, **params))
+            points[str(value)] = run_stages(formula, stages, repeat,
+                                            min_time)
+    return results
+
+
+def compare(results, baseline, threshold=THRESHOLD):
+    """Returns the regressions of results relative to baseline, both given
+    by run_suite: a list of (series, value, stage, baseline time, time) for
+    the stages slower than in baseline by more than threshold, a fraction
+    of the baseline time, and for the stages timed in baseline that failed,
+    with a time of None. Stages missing from either are ignored.
+
+    >>> old = {'series': {'size': {'10': {'simulate': 1.0, 'generate': 2.0}}}}
+    >>> new = {'series': {'size': {'10': {'simulate': 1.5, 'generate': 2.1}}}}
+    >>> compare(new, old)
+    [('size', '10', 'simulate', 1.0, 1.5)]
+    >>> new['series']['size']['10']['generate'] = None
+    >>> compare(new, old)  # doctest: +NORMALIZE_WHITESPACE
+    [('size', '10', 'simulate', 1.0, 1.5),
+     ('size', '10', 'generate', 2.0, None)]
+    """
+    regressions = []
+    for param, points in results['series'].items():
+        for value, times in points.items():
+            old_times = baseline['series'].get(param, {}).get(value, {})
+            for stage, seconds in times.items():
+                old = old_times.get(stage)
+                if old is not None and (seconds is None or
+                                        seconds > old * (1 + threshold)):
+                    regressions.append((param, value, stage, old, seconds))
+    return regressions
+
+
+def print_results(results, file=None):
+    """Prints the times of results, given by run_suite, as one table per
+    series, in microseconds."""
+    if file is None:
+        file = sys.stdout
+    stages = [name for name, func, setup in STAGES]
+    for param, points in results['series'].items():
+        used = [stage for stage in stages
+                if any(stage in times for times in points.values())]
+        print('{:>10}'.format(param), *('{:>18}'.format(stage)
+              for stage in used), file=file)
+        for value, times in points.items():
+            cells = []
+            for stage in used:
+                seconds = times.get(stage)
+                cells.append('{:>18}'.format('-' if seconds is None else
+                             '{:.1f}'.format(seconds * 1e6)))
+            print('{:>10}'.format(value), *cells, file=file)
+        print(file=file)
+
+
+def benchmark_parser(sizes=SIZES, seed=0):
+    """Prints the time taken by parse and by parse_pyparsing on a random
+    formula of each of sizes operators, checking that they agree."""
+    rng = random.Random(seed)
+    print('{:>10} {:>12} {:>12} {:>8}'.format('operators', 'parse',
+          'pyparsing', 'speedup'))
+    for size in sizes:
+        string = random_formula(size, rng)
+        if parse(string) != parse_pyparsing(string):
+            raise AssertionError('parsers disagree on ' + string)
+        builtin = best_time(parse, string)
+        grammar = best_time(parse_pyparsing, string)
+        print('{:>10} {:>11.5f}s {:>11.5f}s {:>7.1f}x'.format(size, builtin,
+              grammar, grammar / builtin))
+
+
+def main(argv):
+    """Runs the benchmarks with the command line arguments argv, without the
+    program name:
+
+        -p: compare parse with parse_pyparsing, see benchmark_parser
+        -o FILE: write the results of run_suite to FILE as JSON
+        -b FILE: compare the results with the baseline in FILE, written by
+            -o, and report the stages slower by more than the threshold
+        -t THRESHOLD: the threshold of -b, a fraction, THRESHOLD by default
+
+    Returns the exit status, 1 if there is a regression."""
+    argv = list(argv)
+    if argv == ['-p']:
+        benchmark_parser()
+        return 0
+    options = {'-o': None, '-b': None, '-t': THRESHOLD}
+    while len(argv) >= 2 and argv[0] in options:
+        options[argv[0]] = argv[1]
+        del argv[:2]
+    if argv:
+        print('usage: benchmark.py [-p] [-o FILE] [-b FILE] [-t THRESHOLD]',
+              file=sys.stderr)
+        return 2
+
+    results = run_suite()
+    print_results(results)
+    if options['-o'] is not None:
+        with open(options['-o'], 'w') as file:
+            json.dump(results, file, indent=1)
+    if options['-b'] is None:
+        return 0
+    with open(options['-b']) as file:
+        baseline = json.load(file)
+    regressions = compare(results, baseline, float(options['-t']))
+    for param, value, stage, old, seconds in regressions:
+        if seconds is None:
+            print('regression: {} = {}, {}: {:.1f}us -> failed'.format(param,
+                  value, stage, old * 1e6))
+            continue
+        print('regression: {} = {}, {}: {:.1f}us -> {:.1f}us ({:+.0%})'.format(
+              param, value, stage, old * 1e6, seconds * 1e6,
+              seconds / old - 1))
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -1,20 +1,35 @@
 #!/usr/bin/env python3
+"""Parsing of strings into Expression objects.
 
-from pyparsing import Word, Literal, Forward, OneOrMore, ZeroOrMore
-from pyparsing import Or, MatchFirst, Group, StringEnd, Empty
+parse, the default parser, is built in and raises ParseError, a subclass
+of ValueError, for an invalid string. It used to be the pyparsing grammar,
+now parse_pyparsing, and raised pyparsing's ParseException, so callers
+catching ParseException must catch ParseError instead. parse_pyparsing
+raises ParseError too. ParseError has the loc, msg, lineno, col and line
+attributes of ParseException, but cannot derive from it since pyparsing
+is only imported by parse_pyparsing.
+"""
+
+import os
+import re
+import threading
+from collections import OrderedDict, namedtuple
 from boolean import NOOP, UNARY, BINARY, OPERATORS, PRECEDENCE, CONSTANTS
 from expression import Expression
 
-__all__ = ['parse']
+__all__ = ['parse', 'parse_pyparsing', 'parse_many', 'ParseError',
+           'ParseCache', 'cached_parse']
 
 # This function will be called by the pattern when an expression is
 # parsed. We only need the first element of tok and push them in the
 # stack. If the function will just only append the first element of tok
-# to the stack, the stack will appear to be in infix order.
-stack = []
+# to the stack, the stack will appear to be in infix order. Each thread has
+# its own stack, set by parse_pyparsing, so threads can parse at once.
+_state = threading.local()
 
 
 def toExpression(s, loc, tok):
+    stack = _state.stack
     curr = tok[0]
     if curr in BINARY:
         args = []
@@ -36,59 +51,224 @@ for i in CONSTANTS:
     alpha_list.remove(i)
 alpha = ''.join(alpha_list)
 
-# nesting
-lpar = Literal('(')
-rpar = Literal(')')
-
-var = Word(alpha)
-constant = MatchFirst([Literal(i) for i in CONSTANTS])
-operand = constant | var
-
-oper_literals = {oper: Literal(oper) for oper in OPERATORS}
-oper_patterns = {oper: Forward() for oper in OPERATORS}
-
-expr = Forward()
-atom = operand | lpar + expr + rpar
-
-prev_pattern = atom
-
-atom.setParseAction(toExpression)
-from pyparsing import Optional
-for opers in PRECEDENCE:
-    pattern_list = []
-    # only accepts unary and binary operation
-    # as there are no ternary in boolean
-    for op in opers:
-        if op in UNARY:
-            alternative = Forward()
-            alternative << (oper_literals[op] + (prev_pattern | alternative))
-            alternative.setParseAction(toExpression)
-            unary_pattern = prev_pattern | alternative
-            pattern_list.append(unary_pattern)
-        elif op in BINARY:
-            rest = oper_literals[op] + prev_pattern
-            rest.setParseAction(toExpression)
-            binary_pattern = prev_pattern + ZeroOrMore(rest)
-            pattern_list.append(binary_pattern)
+# The pyparsing grammar, built by _grammar when first needed. pyparsing is
+# only imported then, which keeps it out of the startup of parse.
+pattern = None
+_grammar_lock = threading.Lock()
+
+
+def _grammar():
+    global pattern
+    if pattern is not None:
+        return pattern
+    with _grammar_lock:
+        if pattern is None:
+            pattern = _build_grammar()
+    return pattern
+
+
+def _build_grammar():
+    from pyparsing import Word, Literal, Forward, ZeroOrMore
+    from pyparsing import Or, MatchFirst, StringEnd, Empty
+
+    # nesting
+    lpar = Literal('(')
+    rpar = Literal(')')
+
+    var = Word(alpha)
+    constant = MatchFirst([Literal(i) for i in CONSTANTS])
+    operand = constant | var
+
+    oper_literals = {oper: Literal(oper) for oper in OPERATORS}
+
+    expr = Forward()
+    atom = operand | lpar + expr + rpar
+
+    prev_pattern = atom
+
+    atom.setParseAction(toExpression)
+    for opers in PRECEDENCE:
+        pattern_list = []
+        # only accepts unary and binary operation
+        # as there are no ternary in boolean
+        for op in opers:
+            if op in UNARY:
+                alternative = Forward()
+                alternative << (oper_literals[op] + (prev_pattern |
+                    alternative))
+                alternative.setParseAction(toExpression)
+                unary_pattern = prev_pattern | alternative
+                pattern_list.append(unary_pattern)
+            elif op in BINARY:
+                rest = oper_literals[op] + prev_pattern
+                rest.setParseAction(toExpression)
+                binary_pattern = prev_pattern + ZeroOrMore(rest)
+                pattern_list.append(binary_pattern)
+            else:
+                raise Exception(op)
+
+        if len(pattern_list) == 1:
+            prev_pattern = pattern_list[0]
         else:
-            raise Exception(op)
+            prev_pattern = Or(pattern_list)
 
-    if len(pattern_list) == 1:
-        prev_pattern = pattern_list[0]
-    else:
-        prev_pattern = Or(pattern_list)
+    expr << prev_pattern
+    return (expr | Empty()) + StringEnd()
+
+# Tokens of the language for parse. NOOP is never matched since whitespace is
+# skipped. Longer symbols go first so that e.g. <=> is not read as a shorter
+# operator.
+whitespace = ' \t\n\r'
+symbols = [oper for oper in OPERATORS if oper != NOOP]
+symbols.extend(CONSTANTS)
+symbols.extend(['(', ')'])
+symbols.sort(key=len, reverse=True)
+ranks = {oper: rank for rank, opers in enumerate(PRECEDENCE) for oper in opers}
+
+
+class ParseError(ValueError):
+    r"""Raised when a string is not a valid expression. Gives the position of
+    the error the same way as pyparsing's ParseException.
+
+    Data defined:
+        pstr: the string parsed
+        loc: the index of the error in pstr
+        msg: the description of the error
+        lineno, col: the line and the column of loc, from 1
+        line: the line of loc
+
+    >>> try:
+    ...     parse('a &\n(b | )')
+    ... except ParseError as ex:
+    ...     print(ex.loc, ex.lineno, ex.col, repr(ex.line))
+    ...     print(ex)
+    9 2 6 '(b | )'
+    Expected an operand, found ')'  (at char 9), (line:2, col:6)
+    """
+
+    def __init__(self, pstr, loc, msg):
+        super().__init__(pstr, loc, msg)
+        self.pstr = pstr
+        self.loc = loc
+        self.msg = msg
+        self.lineno = pstr.count('\n', 0, loc) + 1
+        start = pstr.rfind('\n', 0, loc) + 1
+        end = pstr.find('\n', loc)
+        self.line = pstr[start:] if end < 0 else pstr[start:end]
+        self.col = loc - start + 1
 
-expr << prev_pattern
-pattern = (expr | Empty()) + StringEnd()
+    def __str__(self):
+        found = (', found {!r}'.format(self.pstr[self.loc])
+                 if self.loc < len(self.pstr) else '')
+        return '{}{}  (at char {}), (line:{}, col:{})'.format(self.msg,
+                found, self.loc, self.lineno, self.col)
 
 
 def parse(string):
     """Parses the string into an Expression object.
     If string is composed of only whitespaces or is empty, returns None.
+    Raises ParseError if string is not a valid expression.
+
+    Operator precedence parsing with an explicit stack of operators and one
+    of operands, driven by UNARY, BINARY and PRECEDENCE: an operator waits on
+    the stack until one of lower precedence, i.e. of a later level of
+    PRECEDENCE, or the end of its parentheses comes, and equal ones group
+    from the left. Each token is handled once, so the time is linear in the
+    length of string and the depth of nesting is not limited by recursion.
+    The Expression is the same as the one built by the pyparsing grammar of
+    parse_pyparsing.
+
+    Examples:
+        >>> print(parse('~a & b | c => a <=> b'))
+        ((((~a & b) | c) => a) <=> b)
+        >>> print(parse('a ^ b ^ c'), parse('~~(a)'))
+        ((a ^ b) ^ c) ~~a
+        >>> print(parse('  '))
+        None
+    """
+    operands = []
+    operators = []
+    expect_operand = True
+    loc = 0
+
+    def reduce():
+        oper = operators.pop()
+        if oper in BINARY:
+            arg2 = operands.pop()
+            operands.append(Expression(oper, operands.pop(), arg2))
+        else:
+            operands.append(Expression(oper, operands.pop()))
+
+    while True:
+        while loc < len(string) and string[loc] in whitespace:
+            loc += 1
+        if loc == len(string):
+            break
+
+        for tok in symbols:
+            if string.startswith(tok, loc):
+                break
+        else:
+            end = loc
+            while end < len(string) and string[end] in alpha:
+                end += 1
+            tok = string[loc:end]
+            if not tok:
+                raise ParseError(string, loc, 'Unexpected character')
+
+        if expect_operand:
+            if tok == '(' or tok in UNARY:
+                operators.append(tok)
+            elif tok in OPERATORS or tok == ')':
+                raise ParseError(string, loc, 'Expected an operand')
+            else:
+                operands.append(Expression(NOOP, tok))
+                expect_operand = False
+        elif tok in BINARY:
+            while (operators and operators[-1] != '(' and
+                    ranks[operators[-1]] <= ranks[tok]):
+                reduce()
+            operators.append(tok)
+            expect_operand = True
+        elif tok == ')':
+            while operators and operators[-1] != '(':
+                reduce()
+            if not operators:
+                raise ParseError(string, loc, 'Unexpected )')
+            operators.pop()
+        else:
+            raise ParseError(string, loc, 'Expected end of text')
+        loc += len(tok)
+
+    if expect_operand:
+        if operators:
+            raise ParseError(string, loc, 'Expected an operand')
+        return
+    while operators:
+        if operators[-1] == '(':
+            raise ParseError(string, loc, 'Expected )')
+        reduce()
+    return operands.pop()
+
+
+def parse_pyparsing(string):
+    """Same as parse with the pyparsing grammar, which requires pyparsing.
+
+    The grammar recurses for every level of nesting, expressions nested
+    deeper than the recursion limit are parsed by parse instead.
     """
-    global stack
-    stack = []
-    pattern.parseString(string)
+    grammar = _grammar()
+    from pyparsing import ParseException
+
+    stack = _state.stack = []
+    try:
+        grammar.parseString(string)
+    except ParseException as ex:
+        raise ParseError(string, ex.loc, ex.msg) from None
+    except RecursionError:
+        return parse(string)
+    finally:
+        _state.stack = None
     try:
         # after parsing the stack should have only one item
         res = stack.pop()
@@ -97,3 +277,172 @@ def parse(string):
         return res
     except IndexError:
         return
+
+
+def _parse_item(string, parser=parse):
+    # The result of parse_many for one string
+    try:
+        return parser(string)
+    except ParseError as ex:
+        return ex
+
+
+def parse_many(strings, workers=None, executor='thread', parser=parse):
+    """Parses every string of strings. Returns a list with, for each string
+    in the same order, its Expression, None for a blank string, or the
+    ParseError raised for it, so that one invalid string does not stop the
+    others.
+
+    workers - the number of threads or processes, the number of CPUs by
+        default. With 1 the strings are parsed in the calling thread.
+    executor - 'thread' to parse in threads, 'process' to parse in
+        processes, which get batches of strings to keep the cost of
+        sending them low. Only processes parse in parallel while the
+        interpreter has a global lock, threads keep the memory shared.
+    parser - the function parsing a string, parse by default. It must be
+        picklable, e.g. a module level function, for processes.
+
+    >>> results = parse_many(['a & b', 'a &', '  '], workers=2)
+    >>> print(results[0], type(results[1]).__name__, results[2])
+    (a & b) ParseError None
+    """
+    from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+    strings = list(strings)
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if executor == 'thread':
+        pool = ThreadPoolExecutor
+        chunksize = 1
+    elif executor == 'process':
+        pool = ProcessPoolExecutor
+        chunksize = max(1, len(strings) // (4 * workers))
+    else:
+        raise ValueError('unknown executor: {}'.format(executor))
+
+    parsers = [parser] * len(strings)
+    if workers == 1 or len(strings) <= 1:
+        return list(map(_parse_item, strings, parsers))
+    with pool(workers) as executor:
+        return list(executor.map(_parse_item, strings, parsers,
+                                 chunksize=chunksize))
+
+
+# Default number of strings kept by a ParseCache
+PARSE_CACHE_SIZE = 4096
+
+CacheInfo = namedtuple('CacheInfo',
+        ['hits', 'misses', 'evictions', 'maxsize', 'currsize'])
+
+_whitespace_run = re.compile('[{}]+'.format(re.escape(whitespace)))
+
+
+class ParseCache(object):
+    """Least recently used cache of parsed strings.
+
+    Strings differing only in whitespace, i.e. in the length of the runs of
+    whitespace or in leading and trailing whitespace, share an entry, and
+    every call returns the same Expression object, which is immutable. A
+    string is only parsed on a miss, and then the original string is parsed
+    so that the location of a ParseError is the one in the string given.
+    Strings that do not parse are not cached. The cache can be shared by
+    threads.
+
+    maxsize - the number of strings kept, the least recently used one is
+        evicted when a new one does not fit. 0 disables caching.
+    parser - the function parsing a string, parse by default.
+
+    Examples:
+        >>> cache = ParseCache(maxsize=2)
+        >>> expr = cache.parse('a & b')
+        >>> cache.parse('  a  &\tb ') is expr
+        True
+        >>> cache.parse('a | b') == cache.parse('~a')
+        False
+        >>> cache.cache_info()
+        CacheInfo(hits=1, misses=3, evictions=1, maxsize=2, currsize=2)
+        >>> cache.invalidate('a | b')
+        True
+        >>> cache.clear()
+        >>> cache.cache_info()
+        CacheInfo(hits=0, misses=0, evictions=0, maxsize=2, currsize=0)
+    """
+
+    def __init__(self, maxsize=PARSE_CACHE_SIZE, parser=parse):
+        self.maxsize = maxsize
+        self.parser = parser
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = self.misses = self.evictions = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    @staticmethod
+    def key(string):
+        """Returns the string with its whitespace normalized, under which it
+        is cached."""
+        return _whitespace_run.sub(' ', string).strip(whitespace)
+
+    def parse(self, string):
+        """Same as the parser, through the cache."""
+        key = self.key(string)
+        with self._lock:
+            try:
+                expr = self._entries[key]
+            except KeyError:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self._entries.move_to_end(key)
+                return expr
+
+        # parsed outside of the lock, so that threads parse at once. If
+        # another thread cached the same key meanwhile, its result is kept
+        # and returned, so equal strings always give the same Expression.
+        expr = self.parser(string)
+        if self.maxsize > 0:
+            with self._lock:
+                expr = self._entries.setdefault(key, expr)
+                self._evict(self.maxsize)
+        return expr
+
+    def _evict(self, maxsize):
+        while len(self._entries) > max(maxsize, 0):
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, string):
+        """Removes the entry of string. Returns whether there was one."""
+        with self._lock:
+            return self._entries.pop(self.key(string), self) is not self
+
+    def clear(self):
+        """Removes every entry and resets the counters."""
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = self.evictions = 0
+
+    def resize(self, maxsize):
+        """Changes maxsize, evicting the least recently used entries that no
+        longer fit."""
+        with self._lock:
+            self.maxsize = maxsize
+            self._evict(maxsize)
+
+    def cache_info(self):
+        """Returns the counters of hits, misses and evictions and the sizes of
+        the cache, like functools.lru_cache."""
+        with self._lock:
+            return CacheInfo(self.hits, self.misses, self.evictions,
+                    self.maxsize, len(self._entries))
+
+
+# The cache used by cached_parse
+parse_cache = ParseCache()
+
+
+def cached_parse(string):
+    """Same as parse, through the module's ParseCache, parse_cache. Repeated
+    strings cost a dictionary lookup."""
+    return parse_cache.parse(string)
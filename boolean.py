@@ -112,7 +112,7 @@ def xor(x, y):
     >>> xor(FALSE, FALSE)
     'F'
     """
-    return not_(iff(x, y))
+    return FALSE if x == y else TRUE
 
 
 @args_constant_check
@@ -165,6 +165,86 @@ bool_funcs_dict = {
         IFF: iff
         }
 
+# Unchecked operators on native bool values, for evaluating without the cost
+# of validating the constants on every call. TRUE and FALSE are only needed
+# when reading or showing values, see to_native and from_native.
+NATIVE_CONSTANTS = {TRUE: True, FALSE: False}
+
+native_funcs_dict = {
+        NOOP: lambda x: x,
+        NOT: lambda x: not x,
+        AND: lambda x, y: x and y,
+        OR: lambda x, y: x or y,
+        XOR: lambda x, y: x != y,
+        IF: lambda x, y: not x or y,
+        IFF: lambda x, y: x == y
+        }
+
+
+def to_native(value):
+    """Returns the bool corresponding to the constant value.
+
+    >>> to_native(TRUE), to_native(FALSE)
+    (True, False)
+    """
+    try:
+        return NATIVE_CONSTANTS[value]
+    except (KeyError, TypeError):
+        raise ValueError('invalid constant: {}'.format(str(value)))
+
+
+def native_mappings(mappings, variables):
+    """Returns a dictionary mapping TRUE, FALSE and each of variables to its
+    bool, the value of a variable being given by mappings, for evaluating
+    with native_funcs_dict. Raises ValueError if a variable has no value or
+    a value that is not a constant.
+
+    >>> sorted(native_mappings({'a': TRUE, 'b': FALSE, 'c': 1}, ['a', 'b'])
+    ...        .items())
+    [('F', False), ('T', True), ('a', True), ('b', False)]
+    >>> native_mappings({'a': TRUE}, ['a', 'b'])
+    Traceback (most recent call last):
+        ...
+    ValueError: no value given for: b
+    """
+    values = dict(NATIVE_CONSTANTS)
+    missing = []
+    for var in variables:
+        if var in mappings:
+            values[var] = to_native(mappings[var])
+        elif var not in NATIVE_CONSTANTS:
+            missing.append(var)
+    if missing:
+        raise ValueError('no value given for: {}'.format(', '.join(
+            sorted(map(str, missing)))))
+    return values
+
+
+def from_native(value):
+    """Returns TRUE if value is true else FALSE.
+
+    >>> from_native(True), from_native(0)
+    ('T', 'F')
+    """
+    return TRUE if value else FALSE
+
+
+# The same operators working on integers used as bit vectors: bit r of an
+# operand is the truth value at row r. TRUE is all ones and FALSE is all zeros,
+# and since NOT sets every bit above the last row, the caller must mask the
+# result to the number of rows it evaluated.
+BIT_CONSTANTS = {TRUE: -1, FALSE: 0}
+
+bitwise_funcs_dict = {
+        NOOP: lambda x: x,
+        NOT: lambda x: ~x,
+        AND: lambda x, y: x & y,
+        OR: lambda x, y: x | y,
+        XOR: lambda x, y: x ^ y,
+        IF: lambda x, y: ~x | y,
+        IFF: lambda x, y: ~(x ^ y)
+        }
+
 
 if __name__ == '__main__':
     if TRUE == FALSE:
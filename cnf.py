@@ -0,0 +1,213 @@
+#!/usr/bin/env python3
+
+import sys
+from boolean import TRUE, FALSE, CONSTANTS, NOT, AND, OR, XOR, IF, IFF
+from expression import Expression, DAG
+
+__all__ = ['Tseitin', 'write_dimacs', 'read_variables', 'read_model']
+
+
+class Tseitin(object):
+    """Tseitin encoding of an Expression into conjunctive normal form.
+
+    Every variable of the expression and every operation gets a CNF variable,
+    numbered from 1, with clauses stating that the variable of an operation
+    equals the operation applied to the variables of its operands. The
+    expression is interned in a DAG first so a shared subexpression gets a
+    single variable, and negations reuse the variable of their operand. The
+    number of clauses is thus linear in the size of the expression.
+
+    Literals are the variables, negative for their negation, as in DIMACS.
+
+    Data defined:
+        variables: the CNF variable of each variable of the expression
+        num_vars: the number of CNF variables
+        root: the literal equal to the whole expression
+
+    Examples:
+        >>> cnf = Tseitin(Expression('&', Expression(' ', 'a'), 'b'))
+        >>> cnf.variables, cnf.num_vars, cnf.root
+        ({'a': 1, 'b': 2}, 3, 3)
+        >>> list(cnf.clauses())
+        [[-3, 1], [-3, 2], [3, -1, -2], [3]]
+    """
+
+    # Clauses of z = x oper y, as signs of (z, x, y)
+    TEMPLATES = {
+            AND: ((-1, 1, 0), (-1, 0, 1), (1, -1, -1)),
+            OR: ((1, -1, 0), (1, 0, -1), (-1, 1, 1)),
+            XOR: ((-1, 1, 1), (-1, -1, -1), (1, -1, 1), (1, 1, -1)),
+            IF: ((1, 1, 0), (1, 0, -1), (-1, -1, 1)),
+            IFF: ((-1, -1, 1), (-1, 1, -1), (1, 1, 1), (1, -1, -1))}
+
+    def __init__(self, expr):
+        self._dag = DAG()
+        self._order = self._dag.order(self._dag.add(expr))
+        self.variables = {}
+        self._literals = {}
+        self._constants = {}
+        self.num_vars = 0
+
+        for node_id in self._order:
+            oper, arg1, arg2 = self._dag.nodes[node_id]
+            args = self._dag.args[node_id]
+            if not args:
+                if arg1 in CONSTANTS:
+                    if arg1 not in self._constants:
+                        self._constants[arg1] = self._new_var()
+                    literal = self._constants[arg1]
+                else:
+                    if arg1 not in self.variables:
+                        self.variables[arg1] = self._new_var()
+                    literal = self.variables[arg1]
+            elif oper == NOT:
+                literal = -self._literals[args[0]]
+            elif oper in self.TEMPLATES:
+                literal = self._new_var()
+            else:
+                raise ValueError('unknown operator: {}'.format(oper))
+            self._literals[node_id] = literal
+
+        self.root = self._literals[self._order[-1]]
+
+    def _new_var(self):
+        self.num_vars += 1
+        return self.num_vars
+
+    def literal(self, expr):
+        """Returns the literal of a subexpression of the encoded expression."""
+        return self._literals[self._dag.add(expr)]
+
+    def clauses(self):
+        """Yields the clauses one at a time, as lists of literals. The last
+        one is the unit clause asserting the expression."""
+        for constant, var in self._constants.items():
+            yield [var] if constant == TRUE else [-var]
+
+        for node_id in self._order:
+            oper = self._dag.nodes[node_id][0]
+            if oper not in self.TEMPLATES:
+                continue
+            z = self._literals[node_id]
+            x, y = (self._literals[arg] for arg in self._dag.args[node_id])
+            for signs in self.TEMPLATES[oper]:
+                yield [sign * lit for sign, lit in zip(signs, (z, x, y))
+                       if sign]
+
+        yield [self.root]
+
+    def num_clauses(self):
+        """Returns the number of clauses yielded by clauses, without
+        generating them."""
+        count = len(self._constants) + 1
+        for node_id in self._order:
+            oper = self._dag.nodes[node_id][0]
+            if oper in self.TEMPLATES:
+                count += len(self.TEMPLATES[oper])
+        return count
+
+
+def write_dimacs(expr, file=None):
+    """Writes the Tseitin encoding of expr to file, sys.stdout by default, in
+    the DIMACS CNF format read by SAT solvers. Returns the Tseitin object.
+
+    The clauses are written one at a time as they are generated, so the CNF
+    is never held in memory. The header comes first with the number of
+    clauses, which is known beforehand, followed by a comment line
+    'c <variable> <name>' for each variable of expr, see read_variables.
+
+    Examples:
+        >>> cnf = write_dimacs(Expression('|', Expression(' ', 'a'), 'b'))
+        p cnf 3 4
+        c 1 a
+        c 2 b
+        3 -1 0
+        3 -2 0
+        -3 1 2 0
+        3 0
+    """
+    if file is None:
+        file = sys.stdout
+    cnf = Tseitin(expr)
+    file.write('p cnf {} {}\n'.format(cnf.num_vars, cnf.num_clauses()))
+    for name, var in cnf.variables.items():
+        file.write('c {} {}\n'.format(var, name))
+    for clause in cnf.clauses():
+        file.write(' '.join(map(str, clause)))
+        file.write(' 0\n')
+    return cnf
+
+
+def read_variables(lines):
+    """Returns the variables of the expression named in the comments of a
+    DIMACS file written by write_dimacs, as a dictionary mapping each name to
+    its CNF variable, the same as Tseitin.variables. lines is any iterable
+    of lines, e.g. an open file. Only the lines before the first clause are
+    read.
+
+    >>> read_variables(['p cnf 3 4', 'c 1 a', 'c 2 b', '3 -1 0'])
+    {'a': 1, 'b': 2}
+    """
+    variables = {}
+    for line in lines:
+        fields = line.split()
+        if not fields or fields[0] == 'p':
+            continue
+        if fields[0] != 'c':
+            break
+        if len(fields) == 3 and fields[1].isdigit():
+            variables[fields[2]] = int(fields[1])
+    return variables
+
+
+def read_model(lines, variables):
+    """Reads the output of a SAT solver and returns the assignment of TRUE or
+    FALSE to each name of variables, a dictionary mapping names to CNF
+    variables such as Tseitin.variables or read_variables returns. Returns
+    None if the solver found the formula unsatisfiable, and raises
+    ValueError if it gave any other status or none, e.g. UNKNOWN.
+
+    lines is any iterable of lines, e.g. an open file, in the format of the
+    SAT competitions, 's SATISFIABLE' followed by 'v' lines of literals, or
+    in the format of the result file of MiniSat, 'SAT' followed by the
+    literals. Variables the model leaves out can take either value, FALSE
+    is given to them.
+
+    Examples:
+        >>> read_model(['s SATISFIABLE', 'v -1 2', 'v 3 0'], {'a': 1, 'b': 2})
+        {'a': 'F', 'b': 'T'}
+        >>> read_model(['SAT', '1 -2 -3 0'], {'a': 1, 'b': 2})
+        {'a': 'T', 'b': 'F'}
+        >>> print(read_model(['s UNSATISFIABLE'], {'a': 1, 'b': 2}))
+        None
+        >>> read_model(['s UNKNOWN'], {'a': 1})
+        Traceback (most recent call last):
+            ...
+        ValueError: the solver did not find a model
+    """
+    true = set()
+    satisfiable = False
+    for line in lines:
+        fields = line.split()
+        if fields and fields[0] == 's':
+            fields = fields[1:]
+        if not fields or fields[0] == 'c':
+            continue
+        if fields[0] in ('UNSATISFIABLE', 'UNSAT'):
+            return
+        if fields[0] in ('SATISFIABLE', 'SAT'):
+            satisfiable = True
+            continue
+        if fields[0] == 'v':
+            fields = fields[1:]
+        elif not fields[0].lstrip('-').isdigit():
+            # another status, e.g. UNKNOWN or INDET
+            break
+        for field in fields:
+            literal = int(field)
+            if literal > 0:
+                true.add(literal)
+    if not satisfiable:
+        raise ValueError('the solver did not find a model')
+    return {name: TRUE if var in true else FALSE
+            for name, var in variables.items()}
@@ -1,8 +1,12 @@
 #!/usr/bin/env python3
 
 import collections as _collections
+from boolean import (native_funcs_dict as _native_funcs_dict,
+                     native_mappings as _native_mappings,
+                     from_native as _from_native)
 
-__all__ = ['Expression', 'evaluation_order_simulate']
+__all__ = ['Expression', 'evaluation_order_simulate', 'compile_expression',
+           'evaluate', 'DAG']
 
 
 class Expression(_collections.namedtuple('Expression',
@@ -30,19 +34,15 @@ class Expression(_collections.namedtuple('Expression',
         (+ (- 6) 3)
         """
 
-        values = [self.oper, self.arg1, self.arg2]
-        if self.is_leaf():
-            template = '{}'
-            values = [self.arg1]
-        elif self.arg2 == None:
-            template = '({} {})'
-            values.pop()
-        else:
-            template = '({} {} {})'
-        for i, j in enumerate(values[:]):
-            if isinstance(j, self.__class__):
-                values[i] = j.sexpr()
-        return template.format(*values)
+        def template(expr):
+            values = [expr.oper, expr.arg1, expr.arg2]
+            if expr.is_leaf():
+                return '{}', [expr.arg1]
+            elif expr.arg2 == None:
+                return '({} {})', values[:2]
+            return '({} {} {})', values
+
+        return self._format(template, '{}'.format)
 
     def __str__(self):
         """String representation of the expression in infix form.
@@ -58,21 +58,38 @@ class Expression(_collections.namedtuple('Expression',
             '(4 - (3 * 2))'
             """
 
-        if self.is_leaf():
-            return str(self.arg1)
-
-        infix = [self.arg1, self.oper, self.arg2]
-        if self.arg2 == None:
-            template = '{}{}'
-            infix.pop()
-            infix.reverse()
-        else:
-            template = '({} {} {})'
-
-        for i, tok in enumerate(infix[:]):
-            infix[i] = str(tok)
-
-        return template.format(*infix)
+        def template(expr):
+            if expr.is_leaf():
+                return '{}', [expr.arg1]
+            elif expr.arg2 == None:
+                return '{}{}', [expr.oper, expr.arg1]
+            return '({} {} {})', [expr.arg1, expr.oper, expr.arg2]
+
+        return self._format(template, str)
+
+    def _format(self, template, convert):
+        # Formats the expression without recursion, so that the depth of the
+        # expression is not limited. template returns the template and the
+        # values of an Expression as str.format would take them. Values that
+        # are Expression objects are formatted the same way and anything
+        # else is converted by convert.
+        parts = []
+        stack = [(True, self)]
+        while stack:
+            is_value, item = stack.pop()
+            if not is_value:
+                parts.append(item)
+            elif isinstance(item, Expression):
+                text, values = template(item)
+                texts = text.split('{}')
+                items = [(False, texts[0])]
+                for value, text in zip(values, texts[1:]):
+                    items.append((True, value))
+                    items.append((False, text))
+                stack.extend(reversed(items))
+            else:
+                parts.append(convert(item))
+        return ''.join(parts)
 
     def evaluation_order(self):
         """Returns a list of the evaluation order of the Expression object.
@@ -99,21 +116,27 @@ class Expression(_collections.namedtuple('Expression',
                 arg1=Expression(oper='+', arg1=3, arg2=2), arg2='a')]
         """
 
-        args = [self.arg1, self.arg2]
-
-        if self.arg2 == None or self.is_leaf():
-            args.pop()
-
+        # Walk the expression with an explicit stack instead of recursion.
+        # An item is pushed with done set once its operands are pushed.
         order = []
-        for i, arg in enumerate(args):
-            if isinstance(arg, self.__class__):
-                order.extend(arg.evaluation_order())
-            elif not self.is_leaf():
-                order.append(arg)
-        order.append(self)
+        stack = [(self, False)]
+        while stack:
+            expr, done = stack.pop()
+            if done or not isinstance(expr, Expression) or expr.is_leaf():
+                order.append(expr)
+                continue
+
+            stack.append((expr, True))
+            if expr.arg2 != None:
+                stack.append((expr.arg2, False))
+            stack.append((expr.arg1, False))
 
         return order
 
+    def compile(self, funcs={}):
+        """Returns compile_expression(self, funcs)."""
+        return compile_expression(self, funcs)
+
     def is_leaf(self):
         """Determine whether this object has no children whose type is
         Expression."""
@@ -140,7 +163,8 @@ def simulate(order, mappings={}, funcs={}):
     use that value to simplify the expression.
 
     No error is thrown if ``oper``, ``arg1`` or ``arg2`` does not match
-    ``mappings`` or ``funcs``
+    ``mappings`` or ``funcs``. Operands that are operations, i.e. Expression
+    objects that are not leaves, are not looked up in ``mappings``.
 
     Returns a list equal to the length of ``order`` composed of evaluated
     values correspond to the aformentioned list.
@@ -165,53 +189,284 @@ def simulate(order, mappings={}, funcs={}):
         [8, 5, 3, 8, 3, 4, 12, 20, 160]
     """
 
+    order = _from_nodes(order)
     if isinstance(order, Expression):
         order = order.evaluation_order()
 
-    new_order = []
+    # The substituted values are kept by the id of the node in a DAG rather
+    # than by the statement itself, since hashing an Expression hashes its
+    # whole subtree.
+    dag = DAG()
     subs_expr = {}
+    new_order = []
     for stmt in order:
-        var = stmt
-        if isinstance(stmt, Expression):
-            if stmt.oper == ' ':
-                var = stmt.arg1
-            else:
-                del var
-
-        if 'var' in dir():
+        node_id = dag.add(stmt)
+        if not isinstance(stmt, Expression) or stmt.oper == ' ':
+            var = stmt.arg1 if isinstance(stmt, Expression) else stmt
             try:
                 sub = mappings[var]
             except KeyError:
                 sub = var
-            subs_expr[stmt] = sub
+            subs_expr[node_id] = sub
             new_order.append(sub)
             continue
 
-        if stmt in subs_expr:
-            new_order.append(subs_expr[stmt])
+        if node_id in subs_expr:
+            new_order.append(subs_expr[node_id])
             continue
 
         args = [stmt.arg1, stmt.arg2]
-        if stmt.oper == ' ' or stmt.arg2 == None:
+        if stmt.arg2 == None:
             args.pop()
 
         for i, arg in enumerate(args[:]):
-            try:
-                args[i] = mappings[arg]
-            except KeyError:
+            if not isinstance(arg, Expression) or arg.is_leaf():
                 try:
-                    args[i] = subs_expr[arg]
+                    args[i] = mappings[arg]
+                    continue
                 except KeyError:
                     pass
+            args[i] = subs_expr.get(dag.add(arg), arg)
 
         try:
             ans = funcs[stmt.oper](*args)
         except KeyError:
             ans = stmt
-        subs_expr[stmt] = ans
+        subs_expr[node_id] = ans
         new_order.append(ans)
     return new_order
 
+
+def _from_nodes(order):
+    # Replaces the objects standing for an Expression in order, an
+    # expression or a list of them, by their Expression. Such objects, e.g.
+    # nodetable.Node, have an expression method giving it.
+    if isinstance(order, Expression):
+        return order
+    if hasattr(order, 'expression'):
+        return order.expression()
+    return [stmt.expression() if not isinstance(stmt, Expression) and
+            hasattr(stmt, 'expression') else stmt for stmt in order]
+
+
+def compile_expression(order, funcs={}):
+    """Returns a function taking ``mappings`` that is equivalent to
+    ``simulate(order, mappings, funcs)``.
+
+    The evaluation order is turned into straight-line Python source, with one
+    local variable per unique subexpression, and compiled once. Compiled
+    functions are cached so compiling the same order with the same funcs
+    again is only a lookup.
+
+    Unlike simulate, only the variables, that is the leaves and the operands
+    that are not Expression objects, are looked up in ``mappings``.
+
+    Examples:
+        >>> mappings = {'a': 3, 'b': 8, 'c': 4}
+        >>> funcs = {'+': lambda x, y: x + y, '*': lambda x, y: x * y}
+        >>> a = Expression(' ', 'a') # a
+        >>> d = Expression('+', Expression('+', 5, a), Expression('*', a, 'c'))
+        >>> evaluate = compile_expression(d, funcs)
+        >>> evaluate(mappings)
+        [5, 3, 8, 3, 4, 12, 20]
+        >>> evaluate(mappings) == simulate(d, mappings, funcs)
+        True
+        >>> compile_expression(d, funcs) is evaluate
+        True
+        >>> compile_expression(Expression('-', 'b'), funcs)(mappings)
+        [8, Expression(oper='-', arg1='b', arg2=None)]
+    """
+    order = _from_nodes(order)
+    if isinstance(order, Expression):
+        order = order.evaluation_order()
+    dag = DAG()
+    ids = tuple(dag.add(stmt) for stmt in order)
+    key = (tuple(dag.nodes), ids, frozenset(funcs.items()))
+    try:
+        evaluate = _compiled.pop(key)
+    except KeyError:
+        evaluate = _compile(dag, ids, funcs)
+        if len(_compiled) >= _COMPILED_SIZE:
+            _compiled.popitem(last=False)
+    _compiled[key] = evaluate
+    return evaluate
+
+
+def evaluate(order, mappings):
+    """Returns the value, TRUE or FALSE, of every element of order, like
+    ``simulate(order, mappings, bool_funcs_dict)``, as TRUE and FALSE.
+
+    The constants are only checked and converted on the way in and out:
+    the values of the variables are turned into bools once, and the order
+    is compiled with the unchecked boolean.native_funcs_dict. Raises
+    ValueError if a variable has no value or a value that is not a
+    constant.
+
+    Examples:
+        >>> from bool_parser import parse
+        >>> evaluate(parse('a ^ ~b'), {'a': 'T', 'b': 'F'})
+        ['T', 'F', 'T', 'F']
+        >>> evaluate(parse('a | T'), {'a': True})
+        Traceback (most recent call last):
+            ...
+        ValueError: invalid constant: True
+    """
+    order = _from_nodes(order)
+    if isinstance(order, Expression):
+        order = order.evaluation_order()
+    order = list(order)
+    variables = set()
+    for stmt in order:
+        if not isinstance(stmt, Expression):
+            variables.add(stmt)
+        elif stmt.is_leaf():
+            variables.add(stmt.arg1)
+    values = _native_mappings(mappings, variables)
+    return [_from_native(value) for value in
+            compile_expression(order, _native_funcs_dict)(values)]
+
+
+# Least recently used compiled functions, see compile_expression
+_COMPILED_SIZE = 128
+_compiled = _collections.OrderedDict()
+
+
+def _compile(dag, ids, funcs):
+    consts = []
+    body = []
+
+    def const(value):
+        consts.append(value)
+        return 'k{}'.format(len(consts) - 1)
+
+    for node_id in dag.order(*ids):
+        oper, arg1, arg2 = dag.nodes[node_id]
+        args = dag.args[node_id]
+        if not args:
+            var = const(arg1)
+            body.append('n{} = get({}, {})'.format(node_id, var, var))
+        elif oper in funcs:
+            body.append('n{} = {}({})'.format(node_id, const(funcs[oper]),
+                ', '.join('n{}'.format(arg) for arg in args)))
+        else:
+            body.append('n{} = {}'.format(node_id, const(dag.exprs[node_id])))
+
+    # The constants are globals of the generated function rather than
+    # closure variables, which the compiler handles in quadratic time.
+    source = ['def evaluate(mappings):', '    get = mappings.get']
+    source.extend('    ' + line for line in body)
+    source.append('    return [{}]'.format(', '.join('n{}'.format(node_id)
+        for node_id in ids)))
+
+    namespace = {'k{}'.format(i): value for i, value in enumerate(consts)}
+    exec(compile('\n'.join(source), '<compiled expression>', 'exec'),
+            namespace)
+    return namespace['evaluate']
+
+
+class DAG(object):
+    """Hash-consed store of expressions.
+
+    Structurally identical subexpressions are stored once and identified by a
+    small integer id. A node is a tuple (oper, arg1, arg2) like Expression but
+    with the operands replaced by the ids of their nodes. Leaves keep their
+    arg1, and operands that are not Expression objects get a node of their
+    own, (None, operand, None). Nodes are added after their operands, so
+    sorting ids gives an evaluation order.
+
+    Data defined:
+        nodes: the nodes indexed by id
+        args: the ids of the operands of each node, empty for leaves
+        exprs: the first object added for each node
+
+    Examples:
+        >>> a = Expression('&', Expression(' ', 'a'), 'b')
+        >>> b = Expression('&', Expression(' ', 'a'), 'b')
+        >>> dag = DAG()
+        >>> dag.add(Expression('|', a, b))
+        3
+        >>> dag.nodes
+        [(' ', 'a', None), (None, 'b', None), ('&', 0, 1), ('|', 2, 2)]
+        >>> dag.add(Expression(' ', 'a'))
+        0
+        >>> print(*dag.evaluation_order(2))
+        a b (a & b)
+    """
+
+    def __init__(self):
+        self.nodes = []
+        self.args = []
+        self.exprs = []
+        self._unique = {}
+        # Maps id() of the added objects to their node. The objects are kept
+        # so that their id() cannot be reused. Nothing is hashed but the keys
+        # of the nodes, which are shallow.
+        self._added = {}
+
+    def __len__(self):
+        return len(self.nodes)
+
+    def add(self, expr):
+        """Adds expr and all of its subexpressions. Returns the id of the node
+        of expr."""
+        if not isinstance(expr, Expression) and hasattr(expr, 'expression'):
+            expr = expr.expression()
+        added = self._added
+        stack = [expr]
+        while stack:
+            obj = stack[-1]
+            if id(obj) in added:
+                stack.pop()
+                continue
+
+            if not isinstance(obj, Expression):
+                key = (None, obj, None)
+                args = ()
+            elif obj.is_leaf():
+                key = (obj.oper, obj.arg1, None)
+                args = ()
+            else:
+                operands = [obj.arg1] if obj.arg2 == None else [obj.arg1,
+                        obj.arg2]
+                missing = [arg for arg in operands if id(arg) not in added]
+                if missing:
+                    stack.extend(reversed(missing))
+                    continue
+                args = tuple(added[id(arg)][1] for arg in operands)
+                key = (obj.oper,) + args + (None,) * (2 - len(args))
+
+            stack.pop()
+            node_id = self._unique.get(key)
+            if node_id is None:
+                node_id = len(self.nodes)
+                self._unique[key] = node_id
+                self.nodes.append(key)
+                self.args.append(args)
+                self.exprs.append(obj)
+            added[id(obj)] = (obj, node_id)
+
+        return added[id(expr)][1]
+
+    def order(self, *roots):
+        """Returns the ids of the nodes needed to evaluate roots, in
+        evaluation order and without duplicates."""
+        needed = bytearray(len(self.nodes))
+        stack = list(roots)
+        for node_id in roots:
+            needed[node_id] = 1
+        while stack:
+            for arg in self.args[stack.pop()]:
+                if not needed[arg]:
+                    needed[arg] = 1
+                    stack.append(arg)
+        return [node_id for node_id in range(max(roots, default=-1) + 1)
+                if needed[node_id]]
+
+    def evaluation_order(self, *roots):
+        """Like Expression.evaluation_order but each subexpression appears
+        only once. Returns the first object added for each node."""
+        return [self.exprs[node_id] for node_id in self.order(*roots)]
+
 if __name__ == '__main__':
     import doctest
     doctest.testmod()
@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+
+import heapq
+from boolean import (CONSTANTS, NATIVE_CONSTANTS, native_funcs_dict,
+                     to_native, from_native)
+from expression import Expression, DAG
+
+__all__ = ['IncrementalEvaluator']
+
+
+class IncrementalEvaluator(object):
+    """Keeps the value of expressions up to date as their variables change.
+
+    The value of every distinct subexpression is kept, along with the nodes
+    using it, its parents. When variables change, only their parents are
+    recomputed, then the parents of the nodes whose value changed, and so
+    on: propagation stops at the nodes whose value stays the same. Pending
+    nodes are taken from a heap by DAG id, which puts operands first, so a
+    node is recomputed at most once per update, after all its operands.
+    The cost of an update is thus proportional to the part of the
+    expressions that depends on the changed variables, not to their size.
+
+    rules - an Expression, a dictionary mapping names to expressions, or an
+        iterable of expressions, which are named by their position.
+    mappings - the initial value of every variable.
+    funcs - the functions of the operators, as for simulate. By default,
+        the values are TRUE and FALSE, converted to bools when given and
+        back when read, and the operators are those of native_funcs_dict.
+
+    Data defined:
+        names: the names of the expressions
+        recomputed: the number of nodes recomputed by the last update
+
+    Examples:
+        >>> from bool_parser import parse
+        >>> evaluator = IncrementalEvaluator({'x': parse('(a & b) | c'),
+        ...     'y': parse('~c & d')}, {'a': 'T', 'b': 'F', 'c': 'F',
+        ...     'd': 'T'})
+        >>> evaluator.results()
+        {'x': 'F', 'y': 'T'}
+        >>> evaluator.set('c', 'T')
+        ['x', 'y']
+        >>> evaluator.set('b', 'T'), evaluator.recomputed
+        ([], 2)
+        >>> evaluator.update({'a': 'F', 'c': 'F'})
+        ['x', 'y']
+        >>> evaluator.results()
+        {'x': 'F', 'y': 'T'}
+        >>> IncrementalEvaluator(parse('a & b'), {'a': 'T'})
+        Traceback (most recent call last):
+            ...
+        ValueError: no value given for: b
+    """
+
+    def __init__(self, rules, mappings, funcs=None):
+        if isinstance(rules, Expression):
+            rules = [rules]
+        items = rules.items() if isinstance(rules, dict) else enumerate(rules)
+        self.names = []
+        if funcs is None:
+            self.funcs = native_funcs_dict
+            self._to_value, self._from_value = to_native, from_native
+        else:
+            self.funcs = funcs
+            self._to_value = self._from_value = lambda value: value
+        self.recomputed = 0
+        self._dag = DAG()
+        self._roots = []
+        self._positions = {}
+        for name, rule in items:
+            root = self._dag.add(rule)
+            self._positions.setdefault(root, []).append(len(self.names))
+            self.names.append(name)
+            self._roots.append(root)
+
+        self._values = {}
+        self._parents = {}
+        self._leaves = {}
+        missing = set()
+        for node_id in self._dag.order(*self._roots):
+            self._parents[node_id] = []
+            args = self._dag.args[node_id]
+            for arg in set(args):
+                self._parents[arg].append(node_id)
+            if args:
+                if not missing:
+                    self._values[node_id] = self._compute(node_id)
+                continue
+
+            name = self._dag.nodes[node_id][1]
+            if name in CONSTANTS:
+                self._values[node_id] = (NATIVE_CONSTANTS[name]
+                                         if funcs is None else name)
+            elif name in mappings:
+                self._values[node_id] = self._to_value(mappings[name])
+                self._leaves.setdefault(name, []).append(node_id)
+            else:
+                missing.add(name)
+        if missing:
+            raise ValueError('no value given for: {}'.format(', '.join(
+                sorted(map(str, missing)))))
+
+    def _compute(self, node_id):
+        oper = self._dag.nodes[node_id][0]
+        return self.funcs[oper](*[self._values[arg]
+                                  for arg in self._dag.args[node_id]])
+
+    @property
+    def variables(self):
+        """The names of the variables of the expressions."""
+        return list(self._leaves)
+
+    def value(self, name):
+        """Returns the current value of the expression name."""
+        return self._from_value(self._values[self._roots[
+            self.names.index(name)]])
+
+    def results(self):
+        """Returns a dictionary mapping the name of each expression to its
+        current value."""
+        return {name: self._from_value(self._values[root])
+                for name, root in zip(self.names, self._roots)}
+
+    def set(self, var, value):
+        """Gives the variable var the value value. Returns the names of the
+        expressions whose value changed."""
+        return self.update({var: value})
+
+    def update(self, mappings):
+        """Gives the variables of mappings their new value at once. Returns
+        the names of the expressions whose value changed.
+
+        Nothing changes if a variable is unknown, which raises KeyError, if
+        a value is not valid, which raises ValueError, or if an operator
+        fails on a new value, whose error is raised.
+
+        Examples:
+            >>> from bool_parser import parse
+            >>> evaluator = IncrementalEvaluator({'r': parse('a & b')},
+            ...                                  {'a': 'T', 'b': 'T'})
+            >>> evaluator.update({'a': 'F', 'zz': 'T'})
+            Traceback (most recent call last):
+                ...
+            KeyError: 'zz'
+            >>> evaluator.update({'a': True})
+            Traceback (most recent call last):
+                ...
+            ValueError: invalid constant: True
+            >>> evaluator.set('a', 'F'), evaluator.results()
+            (['r'], {'r': 'F'})
+        """
+        for var in mappings:
+            if var not in self._leaves:
+                raise KeyError(var)
+        mappings = {var: self._to_value(value)
+                    for var, value in mappings.items()}
+
+        # Every node changes at most once, so the expressions whose root
+        # changed are the ones that flipped.
+        pending = []
+        queued = set()
+        flipped = []
+        previous = {}
+
+        def change(node_id, value):
+            previous[node_id] = self._values[node_id]
+            self._values[node_id] = value
+            flipped.extend(self._positions.get(node_id, ()))
+            for parent in self._parents[node_id]:
+                if parent not in queued:
+                    queued.add(parent)
+                    heapq.heappush(pending, parent)
+
+        try:
+            for var, value in mappings.items():
+                for node_id in self._leaves[var]:
+                    if self._values[node_id] != value:
+                        change(node_id, value)
+
+            self.recomputed = 0
+            while pending:
+                node_id = heapq.heappop(pending)
+                self.recomputed += 1
+                value = self._compute(node_id)
+                if value != self._values[node_id]:
+                    change(node_id, value)
+        except Exception:
+            self._values.update(previous)
+            raise
+
+        return [self.names[i] for i in sorted(flipped)]
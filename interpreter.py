@@ -1,16 +1,159 @@
 #!/usr/bin/env python3
+import sys
 from truthtable import TruthTable
-from bool_parser import parse
-from pyparsing import ParseException
-try:
-    import readline
-except ImportError:
-    pass
+from bool_parser import parse, ParseError
+from sat import find_model, is_satisfiable, is_tautology, equivalent
+
+usage = '''usage: interpreter.py [-f format] [-p] [-c line | -r expression [file]]
+
+Without arguments, reads lines from a prompt. Each line is an expression,
+whose truth table is displayed, or a command starting with ':'.
+
+  -f format
+           writes truth tables as box, the default, csv, tsv, jsonl or tf,
+           the same as the :format command
+  -p       writes only the variables and the result in truth tables
+  -c line  runs the line and exits instead, without setting up the prompt
+  -r expression [file]
+           prints the value of the expression for each record of file, or
+           of the standard input if file is - or missing, one per line.
+           The records are CSV with a header naming the variables, or
+           JSON objects one per line.'''
 
 prompt = "bool$: "
 
+# How truth tables are written, see TruthTable.render. Changed by the
+# :format command and the -f and -p options.
+output = {'format': 'box', 'columns': None}
+
+
+def show_model(expr):
+    model = find_model(expr)
+    if model is None:
+        return 'unsatisfiable'
+    return ', '.join('{} = {}'.format(var, model[var])
+                     for var in sorted(model))
+
+# Commands answered by the SAT solver instead of a truth table. The
+# expressions of a command are separated by commas.
+commands = {
+        ':sat': (1, lambda expr: 'satisfiable' if is_satisfiable(expr)
+                 else 'unsatisfiable'),
+        ':taut': (1, lambda expr: 'tautology' if is_tautology(expr)
+                  else 'not a tautology'),
+        ':model': (1, show_model),
+        ':equiv': (2, lambda expr1, expr2: 'equivalent'
+                   if equivalent(expr1, expr2) else 'not equivalent')
+        }
+
+
+def set_format(words):
+    """:format [format] [all | result] sets how truth tables are written and
+    shows it. Returns False if a word is not a format."""
+    from render import FORMATS
+
+    for word in words:
+        if word in FORMATS:
+            output['format'] = word
+        elif word in ('all', 'result'):
+            output['columns'] = None if word == 'all' else word
+        else:
+            print('Unknown format {}, expected one of: {} all result'.format(
+                word, ' '.join(FORMATS)))
+            return False
+    print('format: {} {}'.format(output['format'], output['columns'] or
+                                 'all'))
+    return True
+
+# Commands changing the settings, given the words after the command
+settings = {':format': set_format}
+
+
+def run_command(line):
+    """Runs the command line. Returns False if the command is unknown or
+    its arguments are invalid."""
+    name, _, args = line.partition(' ')
+    if name in settings:
+        return settings[name](args.split())
+    if name not in commands:
+        print('Unknown command {}, expected one of: {}'.format(name,
+            ' '.join(sorted(list(commands) + list(settings)))))
+        return False
+
+    arity, func = commands[name]
+    exprs = [parse(arg) for arg in args.split(',')]
+    if len(exprs) != arity or None in exprs:
+        print('{} expects {} expression(s) separated by commas'.format(name,
+            arity))
+        return False
+    print(func(*exprs))
+    return True
+
+
+def run_line(line):
+    """Runs one line of input, a command or an expression. Returns False if
+    it does not parse or the command fails."""
+    try:
+        if line.startswith(':'):
+            return run_command(line)
+        expr = parse(line)
+    except ParseError as ex:
+        print(ex)
+        return False
+
+    if expr is not None:
+        table = TruthTable(expr)
+        table.render(format=output['format'], columns=output['columns'])
+    return True
+
+
+def run_records(line, path='-'):
+    """Prints the value of the expression line for each record of the file
+    at path, '-' for the standard input, as evaluate_records gives them.
+    Returns False, after printing the error to the standard error, if the
+    expression or a record is invalid or the file cannot be read."""
+    from itertools import chain
+    from records import evaluate_records, read_records
+
+    try:
+        expr = parse(line)
+    except ParseError as ex:
+        print(ex, file=sys.stderr)
+        return False
+    if expr is None:
+        print('no expression given', file=sys.stderr)
+        return False
+
+    try:
+        file = sys.stdin if path == '-' else open(path, newline='')
+    except OSError as ex:
+        print(ex, file=sys.stderr)
+        return False
+    try:
+        # the records are JSON lines if the first one is an object
+        lines = iter(file)
+        first = next(lines, '')
+        format = 'jsonl' if first.lstrip().startswith('{') else 'csv'
+        records = read_records(chain([first], lines), format)
+        for values in evaluate_records(expr, records):
+            sys.stdout.write('\n'.join(values))
+            sys.stdout.write('\n')
+    except (OSError, ValueError) as ex:
+        print(ex, file=sys.stderr)
+        return False
+    finally:
+        if file is not sys.stdin:
+            file.close()
+    return True
+
 
 def loop():
+    try:
+        # line editing and history for the prompt
+        import readline
+    except ImportError:
+        pass
+
     while True:
         try:
             line = input(prompt)
@@ -23,14 +166,34 @@ def loop():
         if not line:
             continue
 
-        try:
-            expr = parse(line)
-        except ParseException as ex:
-            print(ex)
+        run_line(line)
+
+
+def main(argv):
+    """Runs the interpreter with the command line arguments argv, without
+    the program name. Returns the exit status."""
+    argv = list(argv)
+    while argv and argv[0] in ('-f', '-p'):
+        if argv[0] == '-p':
+            output['columns'] = 'result'
+            del argv[0]
             continue
+        from render import FORMATS
+        if len(argv) < 2 or argv[1] not in FORMATS:
+            break
+        output['format'] = argv[1]
+        del argv[:2]
+
+    if not argv:
+        loop()
+        return 0
+    if len(argv) == 2 and argv[0] == '-c':
+        return 0 if run_line(argv[1].strip()) else 1
+    if len(argv) in (2, 3) and argv[0] == '-r':
+        return 0 if run_records(*argv[1:]) else 1
+    print(usage, file=sys.stderr)
+    return 2
 
-        table = TruthTable(expr)
-        table.display_table()
 
 if __name__ == '__main__':
-    loop()
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,294 @@
+#!/usr/bin/env python3
+
+from boolean import TRUE, FALSE, NOOP, NOT, AND, OR
+from expression import Expression
+from truthtable import TruthTable
+from bdd import BDD, dfs_order
+
+__all__ = ['minimize', 'prime_implicants']
+
+# Expressions with at most this many variables are minimized exactly from
+# their truth table, larger ones heuristically from a cube cover.
+QM_VARS = 8
+
+# Number of branches tried when looking for the smallest set of prime
+# implicants, after which the best cover found so far is kept.
+SEARCH_LIMIT = 10000
+
+
+def minimize(expr, exact_vars=QM_VARS):
+    """Returns a sum of products Expression equivalent to expr, an OR of ANDs
+    of variables and negated variables, with as few products and then as few
+    variables as possible.
+
+    If expr has at most exact_vars variables, its truth table is computed as
+    a bit-packed column and minimized by the Quine-McCluskey method: every
+    prime implicant is generated and the smallest set of them covering the
+    column is searched for. Otherwise the rows are not enumerated: expr is
+    built as a BDD whose paths to TRUE give a first cover, which is improved
+    by the expand, irredundant and reduce steps of Espresso until it stops
+    getting smaller. The result is then minimal among the covers Espresso
+    reaches, not necessarily the smallest one.
+
+    Examples:
+        >>> from bool_parser import parse
+        >>> print(minimize(parse('(a & b) | (a & ~b) | (~a & b)')))
+        (a | b)
+        >>> print(minimize(parse('(a => b) & (b => c) & (c => a)')))
+        (((a & b) & c) | ((~a & ~b) & ~c))
+        >>> print(minimize(parse('a <=> ~a')), minimize(parse('a | ~a')))
+        F T
+        >>> print(minimize(parse('(a => b) & (b => c) & a'), exact_vars=0))
+        ((a & b) & c)
+    """
+    variables = TruthTable(expr).vars
+    if len(variables) <= exact_vars:
+        cover = _exact_cover(expr, variables)
+    else:
+        cover = _espresso_cover(expr)
+    return _sum_of_products(cover, variables)
+
+
+def prime_implicants(column, num_vars):
+    """Returns the prime implicants of the function whose truth table over
+    num_vars variables is the bit-packed column, as cubes (care, value): the
+    rows r where r & care == value, bit num_vars - 1 of r being the first
+    variable, 0 when it is TRUE, as in the rows of TruthTable.
+
+    Cubes differing in one bit of their value are merged into a cube without
+    that bit, starting from the rows where column is set, until no more can
+    be merged. The cubes that were never merged are the prime implicants.
+
+    >>> sorted(prime_implicants(0b1110, 2))
+    [(1, 1), (2, 2)]
+    """
+    full = (1 << num_vars) - 1
+    cubes = {(full, row) for row in range(1 << num_vars) if column >> row & 1}
+    primes = set()
+    while cubes:
+        merged = set()
+        used = set()
+        for care, value in cubes:
+            bits = care & value
+            while bits:
+                bit = bits & -bits
+                bits ^= bit
+                other = (care, value ^ bit)
+                if other in cubes:
+                    merged.add((care ^ bit, value ^ bit))
+                    used.add((care, value))
+                    used.add(other)
+        primes |= cubes - used
+        cubes = merged
+    return primes
+
+
+def _exact_cover(expr, variables):
+    # Quine-McCluskey: the fewest prime implicants covering the column, then
+    # the fewest literals. Returns the cubes as lists of (variable, value).
+    num_vars = len(variables)
+    column = TruthTable(expr).columns()[-1] & ((1 << (1 << num_vars)) - 1)
+    rows = range(1 << num_vars)
+    masks = {}
+    for care, value in prime_implicants(column, num_vars):
+        mask = 0
+        for row in rows:
+            if row & care == value:
+                mask |= 1 << row
+        masks[(care, value)] = mask
+    cubes = _smallest_cover(masks, column)
+
+    cover = []
+    for care, value in cubes:
+        cover.append([(name, FALSE if value >> bit & 1 else TRUE)
+                      for name, bit in zip(variables,
+                                           range(num_vars - 1, -1, -1))
+                      if care >> bit & 1])
+    return cover
+
+
+def _smallest_cover(masks, column):
+    # Branch and bound over the primes, masks mapping each prime to the rows
+    # it covers. The rows covered by a single prime select it first, then
+    # the search branches on the primes covering the row with the fewest of
+    # them. The greedy cover bounds the search from the start.
+    def cost(cubes):
+        return len(cubes), sum(bin(care).count('1') for care, value in cubes)
+
+    best = []
+    uncovered = column
+    while uncovered:
+        prime = max(masks, key=lambda p: (bin(masks[p] & uncovered).count(
+            '1'), -bin(p[0]).count('1')))
+        best.append(prime)
+        uncovered &= ~masks[prime]
+
+    steps = 0
+    stack = [(column, [])]
+    while stack and steps < SEARCH_LIMIT:
+        uncovered, chosen = stack.pop()
+        steps += 1
+        if not uncovered:
+            if cost(chosen) < cost(best):
+                best = chosen
+            continue
+        if len(chosen) + 1 > len(best):
+            continue
+
+        options = None
+        row_bits = uncovered
+        while row_bits:
+            row = row_bits & -row_bits
+            row_bits ^= row
+            covering = [p for p in masks if masks[p] & row]
+            if options is None or len(covering) < len(options):
+                options = covering
+                if len(options) == 1:
+                    break
+        options.sort(key=lambda p: bin(masks[p] & uncovered).count('1'))
+        for prime in options:
+            stack.append((uncovered & ~masks[prime], chosen + [prime]))
+    return best
+
+
+def _espresso_cover(expr):
+    # Espresso over a cover of cubes (care, value), bit l standing for the
+    # variable at level l of a BDD of expr, set in value when it is TRUE.
+    # Containment is checked on the BDD instead of on the rows.
+    bdd = BDD(dfs_order(expr))
+    function = bdd.add(expr)
+    complement = bdd.apply(NOT, function)
+
+    def node(cube):
+        care, value = cube
+        result = 1
+        for level in range(care.bit_length() - 1, -1, -1):
+            if care >> level & 1:
+                result = (bdd._node(level, 0, result) if value >> level & 1
+                          else bdd._node(level, result, 0))
+        return result
+
+    def implies(f, g):
+        return bdd.ite(f, bdd.apply(NOT, g), 0) == 0
+
+    def expand(cover):
+        # Drops every literal it can from each cube while it stays inside
+        # the function, then drops the cubes inside an expanded one.
+        expanded = []
+        for care, value in sorted(cover, key=lambda c: bin(c[0]).count('1')):
+            if any(care & other == other and value & other == other_value
+                   for other, other_value in expanded):
+                continue
+            bits = care
+            while bits:
+                bit = bits & -bits
+                bits ^= bit
+                if bdd.ite(node((care ^ bit, value & ~bit)), complement,
+                        0) == 0:
+                    care, value = care ^ bit, value & ~bit
+            expanded = [(other, other_value)
+                        for other, other_value in expanded
+                        if not (other & care == care and
+                                other_value & care == value)]
+            expanded.append((care, value))
+        return expanded
+
+    def others(cover):
+        # For each cube, the union of the cubes after it.
+        suffix = [0] * (len(cover) + 1)
+        for i in range(len(cover) - 1, -1, -1):
+            suffix[i] = bdd.apply(OR, node(cover[i]), suffix[i + 1])
+        return suffix
+
+    def irredundant(cover):
+        # Drops the cubes covered by the others, trying the cubes with the
+        # most literals first.
+        cover = sorted(cover, key=lambda c: -bin(c[0]).count('1'))
+        suffix = others(cover)
+        kept, prefix = [], 0
+        for i, cube in enumerate(cover):
+            if not implies(node(cube), bdd.apply(OR, prefix, suffix[i + 1])):
+                kept.append(cube)
+                prefix = bdd.apply(OR, prefix, node(cube))
+        return kept
+
+    def reduce(cover):
+        # Shrinks each cube to the smallest cube holding the part of it that
+        # no other cube covers, giving expand room to grow it differently.
+        suffix = others(cover)
+        reduced, prefix = [], 0
+        for i, cube in enumerate(cover):
+            rest = bdd.apply(OR, prefix, suffix[i + 1])
+            alone = bdd.ite(rest, 0, node(cube))
+            if alone == 0:
+                continue
+            care, value = cube
+            for level in range(len(bdd.order)):
+                bit = 1 << level
+                if care & bit:
+                    continue
+                var = bdd.var(bdd.order[level])
+                if bdd.ite(alone, bdd.apply(NOT, var), 0) == 0:
+                    care, value = care | bit, value | bit
+                elif bdd.ite(alone, var, 0) == 0:
+                    care |= bit
+            reduced.append((care, value))
+            prefix = bdd.apply(OR, prefix, node((care, value)))
+        return reduced
+
+    def cost(cover):
+        return len(cover), sum(bin(care).count('1') for care, value in cover)
+
+    cover = irredundant(expand(_paths(bdd, function)))
+    while True:
+        candidate = irredundant(expand(reduce(cover)))
+        if cost(candidate) >= cost(cover):
+            break
+        cover = candidate
+
+    return [[(bdd.order[level], TRUE if value >> level & 1 else FALSE)
+             for level in range(care.bit_length()) if care >> level & 1]
+            for care, value in cover]
+
+
+def _paths(bdd, root):
+    # The cubes (care, value) of the paths from root to the TRUE terminal.
+    cubes = []
+    stack = [(root, 0, 0)]
+    while stack:
+        node, care, value = stack.pop()
+        if node == 1:
+            cubes.append((care, value))
+        elif node != 0:
+            level, low, high = bdd.nodes[node]
+            stack.append((low, care | 1 << level, value))
+            stack.append((high, care | 1 << level, value | 1 << level))
+    return cubes
+
+
+def _sum_of_products(cover, variables):
+    # The Expression of a cover given as lists of (variable, value). Products
+    # and literals are sorted in the order of variables.
+    position = {name: i for i, name in enumerate(variables)}
+    if not cover:
+        return Expression(NOOP, FALSE)
+
+    products = []
+    key = lambda literal: (position[literal[0]], literal[1] != TRUE)
+    for cube in sorted(cover, key=lambda cube: sorted(map(key, cube))):
+        literals = []
+        for name, value in sorted(cube, key=key):
+            literal = Expression(NOOP, name)
+            literals.append(literal if value == TRUE else
+                            Expression(NOT, literal))
+        if not literals:
+            return Expression(NOOP, TRUE)
+        product = literals[0]
+        for literal in literals[1:]:
+            product = Expression(AND, product, literal)
+        products.append(product)
+
+    result = products[0]
+    for product in products[1:]:
+        result = Expression(OR, result, product)
+    return result
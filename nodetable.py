@@ -0,0 +1,294 @@
+#!/usr/bin/env python3
+
+from array import array
+from boolean import NOOP, OPERATORS
+from expression import Expression
+
+__all__ = ['NodeTable', 'Node']
+
+# Operator code of the operands that are not Expression objects. Every other
+# node has the index of its oper in OPERATORS as code.
+ATOM = -1
+NONE = -1
+
+
+class NodeTable(object):
+    """Compact store of hash-consed expressions.
+
+    Nodes live in parallel arrays instead of one object per node: the operator
+    code, and the left and right operands, which are indices of other nodes
+    or, for leaves, of a name in the variable table. Structurally identical
+    subexpressions are stored once, so two nodes are equal exactly when their
+    indices are. The unique table is an open addressing hash table of indices
+    in an array as well, which keeps the cost of a node to a few bytes.
+
+    Data defined:
+        opers: the operator code of each node
+        left: the first operand of each node
+        right: the second operand of each node, -1 if there is none
+        names: the variable table
+
+    Examples:
+        >>> table = NodeTable()
+        >>> a = Expression('&', Expression(' ', 'a'), Expression(' ', 'b'))
+        >>> node = table.add(Expression('|', a, Expression('~', a)))
+        >>> print(node, node.sexpr())
+        ((a & b) | ~(a & b)) (| (& a b) (~ (& a b)))
+        >>> len(table), table.names
+        (5, ['a', 'b'])
+        >>> node.arg1 == node.arg2.arg1 == table.add(a)
+        True
+        >>> node.expression() == Expression('|', a, Expression('~', a))
+        True
+
+        A node costs 9 bytes plus 8 to 16 bytes of unique table:
+
+        >>> chain = Expression(' ', 'a')
+        >>> for i in range(10000):
+        ...     chain = Expression('&', chain, Expression(' ', 'b'))
+        >>> table.add(chain).index
+        10003
+        >>> table.nbytes() / len(table) < 25
+        True
+    """
+
+    def __init__(self):
+        self.opers = array('b')
+        self.left = array('i')
+        self.right = array('i')
+        self.names = []
+        self._name_ids = {}
+        self._slots = array('i', [NONE]) * 8
+        self._expressions = {}
+
+    def __len__(self):
+        return len(self.opers)
+
+    def nbytes(self):
+        """Returns the number of bytes used by the node arrays and the unique
+        table."""
+        return sum(len(buf) * buf.itemsize for buf in (self.opers, self.left,
+            self.right, self._slots))
+
+    def add(self, expr):
+        """Adds expr and its subexpressions. Returns the Node of expr."""
+        indices = {}
+        stack = [expr]
+        while stack:
+            obj = stack[-1]
+            if id(obj) in indices:
+                stack.pop()
+                continue
+
+            if not isinstance(obj, Expression):
+                key = (ATOM, self._name(obj), NONE)
+            elif obj.is_leaf():
+                key = (OPERATORS.index(NOOP), self._name(obj.arg1), NONE)
+            else:
+                if obj.oper not in OPERATORS:
+                    raise ValueError('unknown operator: {}'.format(obj.oper))
+                operands = [obj.arg1] if obj.arg2 == None else [obj.arg1,
+                        obj.arg2]
+                missing = [arg for arg in operands if id(arg) not in indices]
+                if missing:
+                    stack.extend(reversed(missing))
+                    continue
+                args = [indices[id(arg)] for arg in operands] + [NONE]
+                key = (OPERATORS.index(obj.oper), args[0], args[1])
+
+            stack.pop()
+            indices[id(obj)] = self._intern(*key)
+
+        return Node(self, indices[id(expr)])
+
+    def node(self, index):
+        """Returns the Node at index."""
+        return Node(self, index)
+
+    def expressions(self, indices):
+        """Returns the Expression of the node at each of indices, or the
+        name for the operands that are not Expression objects. Nodes shared
+        by them become shared Expression objects.
+
+        The Expression of every node converted is kept, so converting the
+        nodes of an evaluation order one by one builds each of them once."""
+        exprs = self._expressions
+        stack = [index for index in indices if index not in exprs]
+        while stack:
+            index = stack[-1]
+            if index in exprs:
+                stack.pop()
+                continue
+
+            code = self.opers[index]
+            if code == ATOM or OPERATORS[code] == NOOP:
+                name = self.names[self.left[index]]
+                exprs[index] = name if code == ATOM else Expression(NOOP,
+                        name)
+                stack.pop()
+                continue
+            operands = [self.left[index]]
+            if self.right[index] != NONE:
+                operands.append(self.right[index])
+            missing = [arg for arg in operands if arg not in exprs]
+            if missing:
+                stack.extend(missing)
+                continue
+            exprs[index] = Expression(OPERATORS[code],
+                                      *[exprs[arg] for arg in operands])
+            stack.pop()
+        return [exprs[index] for index in indices]
+
+    def order(self, *roots):
+        """Returns the indices of the nodes needed to evaluate the nodes at
+        the indices roots, in evaluation order and without duplicates."""
+        needed = bytearray(len(self))
+        stack = list(roots)
+        for index in roots:
+            needed[index] = 1
+        while stack:
+            index = stack.pop()
+            if self._is_leaf(index):
+                continue
+            for arg in (self.left[index], self.right[index]):
+                if arg != NONE and not needed[arg]:
+                    needed[arg] = 1
+                    stack.append(arg)
+        return [index for index in range(max(roots, default=-1) + 1)
+                if needed[index]]
+
+    def _is_leaf(self, index):
+        code = self.opers[index]
+        return code == ATOM or OPERATORS[code] == NOOP
+
+    def _name(self, name):
+        try:
+            return self._name_ids[name]
+        except KeyError:
+            self._name_ids[name] = len(self.names)
+            self.names.append(name)
+            return len(self.names) - 1
+
+    def _slot(self, code, left, right):
+        # Returns the slot of the node (code, left, right) in the unique
+        # table, either holding its index or empty.
+        mask = len(self._slots) - 1
+        slot = hash((code, left, right)) & mask
+        while True:
+            index = self._slots[slot]
+            if index == NONE or (self.opers[index] == code and
+                    self.left[index] == left and self.right[index] == right):
+                return slot
+            slot = (slot + 1) & mask
+
+    def _intern(self, code, left, right):
+        slot = self._slot(code, left, right)
+        if self._slots[slot] != NONE:
+            return self._slots[slot]
+
+        index = len(self)
+        self.opers.append(code)
+        self.left.append(left)
+        self.right.append(right)
+        self._slots[slot] = index
+        if 2 * len(self) > len(self._slots):
+            self._slots = array('i', [NONE]) * (2 * len(self._slots))
+            for i in range(len(self)):
+                slot = self._slot(self.opers[i], self.left[i], self.right[i])
+                self._slots[slot] = i
+        return index
+
+
+class Node(object):
+    """View of a node of a NodeTable with the interface of Expression.
+
+    Nodes compare and hash by their table and index, which is O(1) since
+    equal expressions share the same index. DAG.add, simulate,
+    compile_expression and TruthTable take a Node for the Expression given
+    by its expression method.
+
+    Examples:
+        >>> from bool_parser import parse
+        >>> from truthtable import TruthTable
+        >>> from expression import simulate
+        >>> from boolean import bool_funcs_dict
+        >>> node = NodeTable().add(parse('a & ~a'))
+        >>> TruthTable(node).generate()[1:]
+        [['T', 'F', 'F'], ['F', 'T', 'F']]
+        >>> simulate(node.evaluation_order(), {'a': 'T'}, bool_funcs_dict)
+        ['T', 'T', 'F', 'F']
+    """
+
+    __slots__ = ('table', 'index')
+
+    def __init__(self, table, index):
+        self.table = table
+        self.index = index
+
+    def __eq__(self, other):
+        if not isinstance(other, Node):
+            return NotImplemented
+        return self.table is other.table and self.index == other.index
+
+    def __hash__(self):
+        return hash((id(self.table), self.index))
+
+    def __repr__(self):
+        return 'Node({})'.format(self.index)
+
+    def _operand(self, index):
+        # Operands that are not Expression objects are returned as is.
+        if index == NONE:
+            return None
+        elif self.table.opers[index] == ATOM:
+            return self.table.names[self.table.left[index]]
+        return Node(self.table, index)
+
+    @property
+    def oper(self):
+        code = self.table.opers[self.index]
+        return None if code == ATOM else OPERATORS[code]
+
+    @property
+    def arg1(self):
+        if self.is_leaf():
+            return self.table.names[self.table.left[self.index]]
+        return self._operand(self.table.left[self.index])
+
+    @property
+    def arg2(self):
+        if self.is_leaf():
+            return None
+        return self._operand(self.table.right[self.index])
+
+    def is_leaf(self):
+        return self.table._is_leaf(self.index)
+
+    def expression(self):
+        """Returns the Expression of the node. Shared nodes become shared
+        Expression objects."""
+        return self.table.expressions([self.index])[0]
+
+    def evaluation_order(self):
+        """Same as Expression.evaluation_order, with Node objects in place of
+        Expression objects."""
+        order = []
+        stack = [(self, False)]
+        while stack:
+            node, done = stack.pop()
+            if done or not isinstance(node, Node) or node.is_leaf():
+                order.append(node)
+                continue
+
+            stack.append((node, True))
+            if node.arg2 != None:
+                stack.append((node.arg2, False))
+            stack.append((node.arg1, False))
+        return order
+
+    def sexpr(self):
+        """Same as Expression.sexpr."""
+        return self.expression().sexpr()
+
+    def __str__(self):
+        return str(self.expression())
@@ -96,10 +96,27 @@ class Tokenizer(object):
 
 
 class Evaluator(object):
+    """Evaluates a postfix expression, yielding the value of every variable
+    and operation in order.
+
+    Any values can be used as long as funcs operate on them, e.g. the native
+    bools of boolean.native_funcs_dict, which skip the validation done by
+    boolean.bool_funcs_dict:
+
+    >>> from boolean import native_funcs_dict
+    >>> list(Evaluator(['a', 'b', '~', '&'], native_funcs_dict,
+    ...                {'a': True, 'b': False}))
+    [True, False, True, True]
+    """
+
     def __init__(self, postExpr, funcs, vars={}):
         self.postExpr = list(postExpr)
         self.funcs = dict(funcs)
         self.vars = dict(vars)
+        # inspecting the functions is costly, do it once per function
+        self.arity = {}
+        for oper, func in self.funcs.items():
+            self.arity[oper] = len(inspect.signature(func).parameters)
 
     def __iter__(self):
         stk_opern = []
@@ -109,9 +126,7 @@ class Evaluator(object):
             if i in self.funcs:
                 func = self.funcs[i]
                 arg = []
-                arglen = len(inspect.getfullargspec(func)[0])
-
-                for j in range(arglen):
+                for j in range(self.arity[i]):
                     arg.append(stk_opern.pop())
 
                 arg.reverse()
@@ -128,7 +143,6 @@ class Evaluator(object):
 
         if len(stk_opern) != 1:
             raise Exception
-        raise StopIteration
 
 
 def parse(iterable, operation, preced):
@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+
+from collections import OrderedDict
+from boolean import (bool_funcs_dict, CONSTANTS, TRUE, FALSE, NOOP, NOT, AND,
+                     OR, XOR, IF, IFF)
+from expression import Expression, DAG
+
+__all__ = ['PartialEvaluator', 'cofactor']
+
+# Results of a binary operator when only one operand is known
+KEEP = 'keep'  # the other operand
+NEGATE = 'negate'  # the negation of the other operand
+
+# For each binary operator, its result given the position, 0 or 1, and the
+# value of the known operand. A known first operand whose result is TRUE or
+# FALSE short-circuits the second one, which is not evaluated.
+RULES = {
+        AND: {(0, FALSE): FALSE, (1, FALSE): FALSE,
+              (0, TRUE): KEEP, (1, TRUE): KEEP},
+        OR: {(0, TRUE): TRUE, (1, TRUE): TRUE,
+             (0, FALSE): KEEP, (1, FALSE): KEEP},
+        XOR: {(0, TRUE): NEGATE, (1, TRUE): NEGATE,
+              (0, FALSE): KEEP, (1, FALSE): KEEP},
+        IF: {(0, FALSE): TRUE, (1, TRUE): TRUE,
+             (0, TRUE): KEEP, (1, FALSE): NEGATE},
+        IFF: {(0, TRUE): KEEP, (1, TRUE): KEEP,
+              (0, FALSE): NEGATE, (1, FALSE): NEGATE}}
+
+# Number of assignments whose residual a PartialEvaluator keeps
+CACHE_SIZE = 1024
+
+
+class PartialEvaluator(object):
+    """Evaluates an expression for assignments of only some of its variables.
+
+    The result is the residual expression: the cofactor of the expression,
+    simplified by folding the known values into the operators following
+    RULES, e.g. F & x is F and T & x is x, and by removing double negations.
+    The first operand of an operator is evaluated first, and if it decides
+    the result the second one is skipped. Subexpressions without any known
+    variable are kept as they are, and shared subexpressions are evaluated
+    once.
+
+    Residuals are cached for the last cache_size assignments, an assignment
+    being the values of the variables of the expression, so the other
+    variables of mappings do not matter.
+
+    Examples:
+        >>> from bool_parser import parse
+        >>> evaluator = PartialEvaluator(parse('(a & b) | (c => d) ^ e'))
+        >>> print(evaluator.evaluate({'a': 'F', 'c': 'T'}))
+        (d ^ e)
+        >>> print(evaluator.evaluate({'a': 'T', 'e': 'T'}))
+        ~(b | (c => d))
+        >>> print(evaluator.evaluate({'b': 'T', 'a': 'T', 'e': 'F', 'x': 'F'}))
+        T
+    """
+
+    def __init__(self, expr, cache_size=CACHE_SIZE):
+        self._dag = DAG()
+        self._root = self._dag.add(expr)
+        self.variables = set()
+        for node_id in self._dag.order(self._root):
+            name = self._dag.nodes[node_id][1]
+            if not self._dag.args[node_id] and name not in CONSTANTS:
+                self.variables.add(name)
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+
+    def evaluate(self, mappings):
+        """Returns the residual Expression of the expression when the
+        variables of mappings have their value, TRUE or FALSE. It is a leaf
+        TRUE or FALSE if the value of the expression is known."""
+        key = frozenset((name, mappings[name]) for name in self.variables
+                        if name in mappings)
+        try:
+            residual = self._cache.pop(key)
+        except KeyError:
+            residual = self._evaluate(dict(key))
+            if len(self._cache) >= self.cache_size > 0:
+                self._cache.popitem(last=False)
+        if self.cache_size > 0:
+            self._cache[key] = residual
+        return residual
+
+    def _evaluate(self, mappings):
+        dag = self._dag
+        results = {}
+        stack = [self._root]
+        while stack:
+            node_id = stack[-1]
+            if node_id in results:
+                stack.pop()
+                continue
+
+            oper, name, arg2 = dag.nodes[node_id]
+            args = dag.args[node_id]
+            if not args:
+                value = mappings.get(name, name)
+                if value not in CONSTANTS and name in mappings:
+                    raise ValueError('invalid value for {}: {}'.format(name,
+                        value))
+                results[node_id] = (value if value in CONSTANTS
+                                    else dag.exprs[node_id])
+                stack.pop()
+                continue
+            if args[0] not in results:
+                stack.append(args[0])
+                continue
+
+            x = results[args[0]]
+            if oper == NOT:
+                results[node_id] = (bool_funcs_dict[NOT](x) if x in CONSTANTS
+                                    else _negate(x))
+            elif oper not in RULES:
+                raise ValueError('unknown operator: {}'.format(oper))
+            elif x in CONSTANTS and RULES[oper][0, x] in CONSTANTS:
+                results[node_id] = RULES[oper][0, x]
+            elif args[1] not in results:
+                stack.append(args[1])
+                continue
+            else:
+                y = results[args[1]]
+                if x in CONSTANTS and y in CONSTANTS:
+                    results[node_id] = bool_funcs_dict[oper](x, y)
+                elif x in CONSTANTS:
+                    results[node_id] = _fold(RULES[oper][0, x], y)
+                elif y in CONSTANTS:
+                    results[node_id] = _fold(RULES[oper][1, y], x)
+                elif x is dag.exprs[args[0]] and y is dag.exprs[args[1]]:
+                    results[node_id] = dag.exprs[node_id]
+                else:
+                    results[node_id] = Expression(oper, x, y)
+            stack.pop()
+
+        residual = results[self._root]
+        if isinstance(residual, Expression):
+            return residual
+        return Expression(NOOP, residual)
+
+
+def _fold(rule, other):
+    # The result of an operator with the other operand unknown
+    if rule == KEEP:
+        return other
+    elif rule == NEGATE:
+        return _negate(other)
+    return rule
+
+
+def _negate(expr):
+    if isinstance(expr, Expression) and expr.oper == NOT:
+        return expr.arg1
+    return Expression(NOT, expr)
+
+
+def cofactor(expr, mappings):
+    """Returns the residual Expression of expr for the partial assignment
+    mappings, see PartialEvaluator.
+
+    >>> from bool_parser import parse
+    >>> print(cofactor(parse('~a <=> b'), {'a': 'F'}))
+    b
+    """
+    return PartialEvaluator(expr, cache_size=0).evaluate(mappings)
@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+
+import csv
+import json
+from boolean import bitwise_funcs_dict, BIT_CONSTANTS, CONSTANTS, TRUE, FALSE
+from expression import Expression, DAG, compile_expression
+
+__all__ = ['evaluate_records', 'iter_column_batches', 'read_records']
+
+# Number of records evaluated at once
+BATCH_SIZE = 4096
+
+# Values of the variables in records, strings being compared in lower case
+TRUTH_VALUES = {
+        TRUE: True, FALSE: False, True: True, False: False,
+        't': True, 'f': False, 'true': True, 'false': False,
+        '1': True, '0': False, 'yes': True, 'no': False}
+
+
+def iter_column_batches(expr, records, batch_size=BATCH_SIZE):
+    """Evaluates expr for each assignment of records, an iterable of
+    mappings from the variables of expr to their values, which are TRUE or
+    FALSE, bools, 0 or 1, or strings such as 'true', '0' or 'no' as found in
+    CSV files. Other keys are ignored.
+
+    Yields, for each batch of batch_size records, the number of records in
+    it and an integer whose bit r is set when expr is TRUE for its r-th
+    record. The values of a variable in a batch are packed into an integer
+    the same way, and expr is compiled once and evaluated on those integers
+    with one bitwise operation per subexpression, like TruthTable.columns.
+
+    Raises ValueError if a record is not a dictionary, lacks a variable or
+    has a value that is not a truth value, such as a float or a list.
+
+    Examples:
+        >>> expr = Expression('&', Expression(' ', 'a'), 'b')
+        >>> records = [{'a': 'T', 'b': 'T'}, {'a': 'T', 'b': 'F'},
+        ...            {'a': True, 'b': 1}]
+        >>> list(iter_column_batches(expr, records, batch_size=2))
+        [(2, 1), (1, 1)]
+        >>> list(iter_column_batches(expr, [{'a': 1.0, 'b': 'T'}]))
+        Traceback (most recent call last):
+            ...
+        ValueError: invalid value for a in record {'a': 1.0, 'b': 'T'}: 1.0
+        >>> list(iter_column_batches(expr, [{'a': 'T', 'b': ['T']}]))
+        Traceback (most recent call last):
+            ...
+        ValueError: invalid value for b in record {'a': 'T', 'b': ['T']}: ['T']
+        >>> list(iter_column_batches(expr, [['T', 'T']]))
+        Traceback (most recent call last):
+            ...
+        ValueError: record is not a mapping: ['T', 'T']
+    """
+    dag = DAG()
+    order = dag.evaluation_order(dag.add(expr))
+    evaluate = compile_expression(order, bitwise_funcs_dict)
+    variables = set()
+    for stmt in order:
+        name = stmt.arg1 if isinstance(stmt, Expression) else stmt
+        if ((not isinstance(stmt, Expression) or stmt.is_leaf()) and
+                name not in CONSTANTS):
+            variables.add(name)
+
+    mappings = dict(BIT_CONSTANTS)
+    batch = []
+    for record in records:
+        batch.append(record)
+        if len(batch) == batch_size:
+            yield len(batch), _evaluate_batch(evaluate, batch, variables,
+                    mappings)
+            batch = []
+    if batch:
+        yield len(batch), _evaluate_batch(evaluate, batch, variables,
+                mappings)
+
+
+def _evaluate_batch(evaluate, batch, variables, mappings):
+    for name in variables:
+        try:
+            bits = [TRUTH_VALUES[_normalize(record[name])]
+                    for record in reversed(batch)]
+        except (KeyError, TypeError):
+            for record in batch:
+                if not isinstance(record, dict):
+                    raise ValueError('record is not a mapping: {!r}'.format(
+                        record)) from None
+                if name not in record:
+                    raise ValueError('missing variable {} in record {}'
+                            .format(name, record)) from None
+                if _normalize(record[name]) not in TRUTH_VALUES:
+                    raise ValueError('invalid value for {} in record {}: '
+                            '{!r}'.format(name, record, record[name])
+                            ) from None
+            raise
+        mappings[name] = int(''.join(['1' if bit else '0' for bit in bits]),
+                2)
+    return evaluate(mappings)[-1] & ((1 << len(batch)) - 1)
+
+
+def _normalize(value):
+    # Strings are matched without surrounding whitespace and case, and
+    # integers as 0 and 1 only. Any other type, e.g. floats, lists or
+    # dictionaries, gives None, which is not a truth value.
+    if isinstance(value, str):
+        return value.strip().lower() if value not in CONSTANTS else value
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, int):
+        return str(value)
+    return None
+
+
+def evaluate_records(expr, records, batch_size=BATCH_SIZE):
+    """Same as iter_column_batches, yielding the value of expr, TRUE or
+    FALSE, for each record of each batch as lists.
+
+    >>> expr = Expression('=>', Expression(' ', 'a'), Expression(' ', 'b'))
+    >>> records = read_records(['a,b', '1,0', 'false,true'])
+    >>> list(evaluate_records(expr, records))
+    [['F', 'T']]
+    """
+    for size, column in iter_column_batches(expr, records, batch_size):
+        yield [TRUE if column >> row & 1 else FALSE for row in range(size)]
+
+
+def read_records(lines, format='csv'):
+    """Yields the records of lines, any iterable of lines such as an open
+    file, as dictionaries. The records are read one at a time.
+
+    format - 'csv' for comma separated values with a header line naming the
+        variables, or 'jsonl' for one JSON object per line.
+
+    Raises ValueError if a line of JSON is not an object.
+
+    >>> list(read_records(['{"a": true, "b": "F"}', ''], 'jsonl'))
+    [{'a': True, 'b': 'F'}]
+    >>> list(read_records(['[true, false]'], 'jsonl'))
+    Traceback (most recent call last):
+        ...
+    ValueError: record is not a JSON object: [true, false]
+    """
+    if format == 'csv':
+        yield from csv.DictReader(lines)
+    elif format == 'jsonl':
+        for line in lines:
+            if line.strip():
+                record = json.loads(line)
+                if not isinstance(record, dict):
+                    raise ValueError('record is not a JSON object: {}'
+                            .format(line.strip()))
+                yield record
+    else:
+        raise ValueError('unknown format: {}'.format(format))
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+
+import csv
+import io
+import json
+import sys
+from boolean import CONSTANTS
+
+__all__ = ['render', 'FORMATS']
+
+# Number of rows written to the file at once
+BUFFER_ROWS = 1024
+
+
+def _box(head):
+    # The table of display_table: every cell centered and bordered.
+    widths = [len(name) + 2 for name in head]
+    border = '+' + '+'.join('-' * width for width in widths) + '+\n'
+    cells = [{value: value.center(width) for value in CONSTANTS}
+             for width in widths]
+    text = border + '|' + '|'.join(name.center(width) for name, width in
+                                   zip(head, widths)) + '|\n' + border
+
+    def row_text(row):
+        return '|' + '|'.join([column[value] for column, value in
+                               zip(cells, row)]) + '|\n' + border
+
+    return text, row_text
+
+
+def _delimited(head, delimiter):
+    # Values separated by delimiter, the head being the first line, quoted
+    # by the csv module if needed. The values never need quoting.
+    buffer = io.StringIO()
+    csv.writer(buffer, delimiter=delimiter, lineterminator='\n').writerow(
+            head)
+    return buffer.getvalue(), lambda row: delimiter.join(row) + '\n'
+
+
+def _jsonl(head):
+    # One JSON object per row, mapping each formula to its value.
+    keys = [json.dumps(name) + ': "' for name in head]
+
+    def row_text(row):
+        return '{' + ', '.join([key + value + '"' for key, value in
+                                zip(keys, row)]) + '}\n'
+
+    return '', row_text
+
+
+def _tf(head):
+    # The values of a row as one word, e.g. TFT, without a head.
+    return '', lambda row: ''.join(row) + '\n'
+
+
+# Formats of render: each returns the text of the head and the function
+# giving the text of a row.
+FORMATS = {
+        'box': _box,
+        'csv': lambda head: _delimited(head, ','),
+        'tsv': lambda head: _delimited(head, '\t'),
+        'jsonl': _jsonl,
+        'tf': _tf}
+
+
+def render(head, rows, file=None, format='box', columns=None):
+    """Writes a table to file, sys.stdout by default, in format, one of
+    FORMATS:
+
+        box: bordered cells, as TruthTable.display_table prints them
+        csv, tsv: comma or tab separated values, with the head first
+        jsonl: a JSON object per row mapping each head to its value
+        tf: the values of each row as a single word, without the head
+
+    head - the names of the columns, converted with str.
+    rows - an iterable of rows, each a list of TRUE or FALSE.
+    columns - the indices of the columns written, in that order, all of
+        them by default.
+
+    The text of the rows is gathered and written BUFFER_ROWS rows at a time.
+
+    Examples:
+        >>> head = ['a', 'b', '(a & b)']
+        >>> rows = [['T', 'T', 'T'], ['T', 'F', 'F']]
+        >>> render(head, rows, format='csv', columns=[0, 2])
+        a,(a & b)
+        T,T
+        T,F
+        >>> render(head, rows, format='jsonl')
+        {"a": "T", "b": "T", "(a & b)": "T"}
+        {"a": "T", "b": "F", "(a & b)": "F"}
+        >>> render(head, rows, format='tf')
+        TTT
+        TFF
+    """
+    if format not in FORMATS:
+        raise ValueError('unknown format: {}, expected one of: {}'.format(
+            format, ', '.join(FORMATS)))
+    if file is None:
+        file = sys.stdout
+    head = [str(name) for name in head]
+    if columns is not None:
+        columns = list(columns)
+        head = [head[i] for i in columns]
+
+    text, row_text = FORMATS[format](head)
+    buffer = [text]
+    for row in rows:
+        if columns is not None:
+            row = [row[i] for i in columns]
+        buffer.append(row_text(row))
+        if len(buffer) >= BUFFER_ROWS:
+            file.write(''.join(buffer))
+            buffer = []
+    file.write(''.join(buffer))
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+
+from boolean import (CONSTANTS, native_funcs_dict, native_mappings,
+                     from_native)
+from expression import Expression, DAG, compile_expression
+
+__all__ = ['RuleSet']
+
+
+class RuleSet(object):
+    """Many expressions, the rules, evaluated together.
+
+    The rules are interned in one DAG, so a subexpression shared by several
+    rules, or appearing several times in one, is a single node. Evaluating
+    the rule set computes every distinct node once, in one compiled function,
+    so the cost grows with the number of distinct subexpressions rather than
+    with the total size of the rules.
+
+    rules - a dictionary mapping names to expressions, or an iterable of
+        expressions, which are named by their position.
+
+    Data defined:
+        names: the names of the rules, in the order they were added
+
+    Examples:
+        >>> from bool_parser import parse
+        >>> rules = RuleSet({'r1': parse('(a & b) | c'),
+        ...                  'r2': parse('~(a & b)'),
+        ...                  'r3': parse('c => (a & b)')})
+        >>> rules.evaluate({'a': 'T', 'b': 'F', 'c': 'T'})
+        {'r1': 'T', 'r2': 'T', 'r3': 'F'}
+        >>> rules.add(parse('a & b'))
+        3
+        >>> len(rules), rules.num_nodes(), sorted(rules.variables())
+        (4, 7, ['a', 'b', 'c'])
+    """
+
+    def __init__(self, rules=()):
+        self.names = []
+        self._dag = DAG()
+        self._roots = []
+        self._compiled = {}
+        self._variables = None
+        items = rules.items() if isinstance(rules, dict) else (
+                (None, rule) for rule in rules)
+        for name, rule in items:
+            self.add(rule, name)
+
+    def __len__(self):
+        return len(self.names)
+
+    def add(self, rule, name=None):
+        """Adds the expression rule, named name, by default its position.
+        Returns the name."""
+        if not isinstance(rule, Expression):
+            raise TypeError('a rule must be an Expression: {!r}'.format(rule))
+        if name is None:
+            name = len(self.names)
+        self._roots.append(self._dag.add(rule))
+        self.names.append(name)
+        self._compiled.clear()
+        self._variables = None
+        return name
+
+    def num_nodes(self):
+        """Returns the number of distinct subexpressions of the rules, i.e.
+        the number of operations of an evaluation."""
+        return len(self._dag.order(*self._roots))
+
+    def variables(self):
+        """Returns the names of the variables of the rules."""
+        if self._variables is None:
+            self._variables = set()
+            for node_id in self._dag.order(*self._roots):
+                name = self._dag.nodes[node_id][1]
+                if not self._dag.args[node_id] and name not in CONSTANTS:
+                    self._variables.add(name)
+        return self._variables
+
+    def compile(self, funcs=None):
+        """Returns a function taking mappings, like simulate, and returning
+        the value of every rule, in the order of names. It is compiled once
+        for each funcs until a rule is added.
+
+        By default, the values are TRUE and FALSE, checked and converted to
+        bools on the way in and back on the way out, and the rules are
+        evaluated with the unchecked native_funcs_dict. Otherwise the values
+        are given to the functions of funcs as they are."""
+        if funcs is None:
+            evaluate = self.compile(native_funcs_dict)
+            variables = self.variables()
+            return lambda mappings: [from_native(value) for value in
+                                     evaluate(native_mappings(mappings,
+                                                              variables))]
+
+        key = frozenset(funcs.items())
+        try:
+            return self._compiled[key]
+        except KeyError:
+            evaluate = compile_expression([self._dag.exprs[root]
+                                           for root in self._roots], funcs)
+            self._compiled[key] = evaluate
+            return evaluate
+
+    def evaluate(self, mappings, funcs=None):
+        """Returns a dictionary mapping the name of each rule to its value
+        when the variables have the values in mappings. The operators are
+        the functions of funcs, as for compile."""
+        return dict(zip(self.names, self.compile(funcs)(mappings)))
@@ -0,0 +1,353 @@
+#!/usr/bin/env python3
+
+import heapq
+from boolean import TRUE, FALSE, NOT, XOR
+from expression import Expression
+from cnf import Tseitin
+
+__all__ = ['Solver', 'find_model', 'is_satisfiable', 'is_tautology',
+           'equivalent']
+
+
+class Solver(object):
+    """Conflict driven clause learning SAT solver.
+
+    Clauses are lists of DIMACS literals: a variable numbered from 1, negative
+    for its negation. Unit propagation watches two literals per clause,
+    conflicts are analysed up to the first unique implication point and the
+    learnt clause is added, then the search backjumps to the second highest
+    level of the clause. Decisions follow the variable activity bumped during
+    conflict analysis, using the last value of the variable, and the search
+    restarts following the Luby sequence.
+
+    Internally the literal of variable v is 2 * v when positive and
+    2 * v + 1 when negative, so that lit ^ 1 is its negation.
+
+    Examples:
+        >>> solver = Solver(3)
+        >>> for clause in ([1, 2], [-1, 2], [1, -2], [-2, 3]):
+        ...     solver.add_clause(clause)
+        >>> solver.solve()
+        {1: True, 2: True, 3: True}
+        >>> solver.add_clause([-3])
+        >>> print(solver.solve())
+        None
+    """
+
+    RESTART_BASE = 100
+    ACTIVITY_DECAY = 0.95
+
+    def __init__(self, num_vars=0):
+        self.num_vars = 0
+        self.clauses = []
+        self.watches = [[], []]
+        self.values = [0, 0]
+        self.level = [0]
+        self.reason = [None]
+        self.activity = [0.0]
+        self.polarity = [False]
+        self.trail = []
+        self.trail_lim = []
+        self.qhead = 0
+        self.increment = 1.0
+        self.heap = []
+        self.conflicts = 0
+        self.ok = True
+        self.ensure_vars(num_vars)
+
+    def ensure_vars(self, num_vars):
+        """Makes variables up to num_vars available."""
+        while self.num_vars < num_vars:
+            self.num_vars += 1
+            self.watches.extend(([], []))
+            self.values.extend((0, 0))
+            self.level.append(0)
+            self.reason.append(None)
+            self.activity.append(0.0)
+            self.polarity.append(False)
+            heapq.heappush(self.heap, (0.0, self.num_vars))
+
+    def add_clause(self, clause):
+        """Adds a clause. Must not be called while solving."""
+        self._backtrack(0)
+        literals = []
+        for literal in clause:
+            self.ensure_vars(abs(literal))
+            lit = 2 * literal if literal > 0 else -2 * literal + 1
+            if lit ^ 1 in literals or self.values[lit] == 1:
+                return
+            if lit not in literals and self.values[lit] == 0:
+                literals.append(lit)
+
+        if not literals:
+            self.ok = False
+        elif len(literals) == 1:
+            self._enqueue(literals[0], None)
+            self.ok = self.ok and self._propagate() is None
+        else:
+            self._attach(literals)
+
+    def solve(self, assumptions=()):
+        """Returns a model as a dictionary mapping every variable to a bool,
+        or None if the clauses are unsatisfiable under the assumptions, a
+        sequence of literals that must hold."""
+        self._backtrack(0)
+        if not self.ok:
+            return
+        assumptions = [2 * lit if lit > 0 else -2 * lit + 1
+                       for lit in assumptions]
+        for literal in assumptions:
+            self.ensure_vars(literal >> 1)
+
+        restart = 0
+        while True:
+            status = self._search(self.RESTART_BASE * _luby(restart),
+                    assumptions)
+            if status is not None:
+                break
+            restart += 1
+
+        if not status:
+            self._backtrack(0)
+            return
+        model = {var: self.values[2 * var] == 1
+                 for var in range(1, self.num_vars + 1)}
+        self._backtrack(0)
+        return model
+
+    def _attach(self, literals):
+        index = len(self.clauses)
+        self.clauses.append(literals)
+        self.watches[literals[0]].append(index)
+        self.watches[literals[1]].append(index)
+        return index
+
+    def _enqueue(self, lit, reason):
+        var = lit >> 1
+        self.values[lit] = 1
+        self.values[lit ^ 1] = -1
+        self.level[var] = len(self.trail_lim)
+        self.reason[var] = reason
+        self.trail.append(lit)
+
+    def _propagate(self):
+        # Returns the index of a conflicting clause or None.
+        values = self.values
+        clauses = self.clauses
+        watches = self.watches
+        while self.qhead < len(self.trail):
+            false_lit = self.trail[self.qhead] ^ 1
+            self.qhead += 1
+            watching = watches[false_lit]
+            kept = []
+            for i, index in enumerate(watching):
+                clause = clauses[index]
+                if clause[0] == false_lit:
+                    clause[0], clause[1] = clause[1], false_lit
+                if values[clause[0]] == 1:
+                    kept.append(index)
+                    continue
+
+                for k in range(2, len(clause)):
+                    if values[clause[k]] != -1:
+                        clause[1], clause[k] = clause[k], false_lit
+                        watches[clause[1]].append(index)
+                        break
+                else:
+                    kept.append(index)
+                    if values[clause[0]] == -1:
+                        kept.extend(watching[i + 1:])
+                        watches[false_lit] = kept
+                        return index
+                    self._enqueue(clause[0], index)
+            watches[false_lit] = kept
+
+    def _analyze(self, conflict):
+        # First unique implication point learning. Returns the learnt
+        # clause, with the asserting literal first and a literal of the
+        # backjump level second, and the backjump level.
+        seen = set()
+        learnt = [None]
+        counter = 0
+        lit = None
+        index = len(self.trail) - 1
+        current = len(self.trail_lim)
+        clause = self.clauses[conflict]
+        while True:
+            for q in (clause if lit is None else clause[1:]):
+                var = q >> 1
+                if var not in seen and self.level[var] > 0:
+                    seen.add(var)
+                    self._bump(var)
+                    if self.level[var] == current:
+                        counter += 1
+                    else:
+                        learnt.append(q)
+            while self.trail[index] >> 1 not in seen:
+                index -= 1
+            lit = self.trail[index]
+            index -= 1
+            counter -= 1
+            if counter == 0:
+                break
+            clause = self.clauses[self.reason[lit >> 1]]
+
+        learnt[0] = lit ^ 1
+        if len(learnt) == 1:
+            return learnt, 0
+        second = max(range(1, len(learnt)),
+                key=lambda i: self.level[learnt[i] >> 1])
+        learnt[1], learnt[second] = learnt[second], learnt[1]
+        return learnt, self.level[learnt[1] >> 1]
+
+    def _bump(self, var):
+        self.activity[var] += self.increment
+        if self.activity[var] > 1e100:
+            for v in range(1, self.num_vars + 1):
+                self.activity[v] *= 1e-100
+            self.increment *= 1e-100
+            self.heap = [(-self.activity[v], v)
+                         for v in range(1, self.num_vars + 1)]
+            heapq.heapify(self.heap)
+        else:
+            heapq.heappush(self.heap, (-self.activity[var], var))
+
+    def _backtrack(self, level):
+        if len(self.trail_lim) <= level:
+            return
+        start = self.trail_lim[level]
+        for lit in self.trail[start:]:
+            var = lit >> 1
+            self.values[lit] = self.values[lit ^ 1] = 0
+            self.reason[var] = None
+            self.polarity[var] = not lit & 1
+            heapq.heappush(self.heap, (-self.activity[var], var))
+        del self.trail[start:]
+        del self.trail_lim[level:]
+        self.qhead = len(self.trail)
+        if len(self.heap) > 8 * self.num_vars + 64:
+            # drop the stale entries
+            self.heap = [(-self.activity[v], v)
+                         for v in range(1, self.num_vars + 1)]
+            heapq.heapify(self.heap)
+
+    def _decide(self):
+        # Returns the unassigned variable with the highest activity, or None.
+        # The heap may hold stale entries, which are skipped.
+        while self.heap:
+            activity, var = heapq.heappop(self.heap)
+            if self.values[2 * var] == 0 and -activity == self.activity[var]:
+                return var
+
+    def _search(self, budget, assumptions):
+        # Returns True if satisfiable, False if not, or None to restart
+        # after budget conflicts.
+        conflicts = 0
+        while True:
+            conflict = self._propagate()
+            if conflict is not None:
+                self.conflicts += 1
+                conflicts += 1
+                if not self.trail_lim:
+                    self.ok = False
+                    return False
+                learnt, level = self._analyze(conflict)
+                self._backtrack(level)
+                if len(learnt) == 1:
+                    self._enqueue(learnt[0], None)
+                else:
+                    self._enqueue(learnt[0], self._attach(learnt))
+                self.increment /= self.ACTIVITY_DECAY
+                continue
+
+            if conflicts >= budget:
+                self._backtrack(0)
+                return
+
+            # assumptions are the first decisions
+            lit = None
+            while len(self.trail_lim) < len(assumptions):
+                lit = assumptions[len(self.trail_lim)]
+                if self.values[lit] == -1:
+                    return False
+                self.trail_lim.append(len(self.trail))
+                if self.values[lit] == 0:
+                    break
+                lit = None
+            else:
+                var = self._decide()
+                if var is None:
+                    return True
+                self.trail_lim.append(len(self.trail))
+                lit = 2 * var + (not self.polarity[var])
+            if lit is not None:
+                self._enqueue(lit, None)
+
+
+def _luby(i):
+    # The i-th element of the Luby sequence 1 1 2 1 1 2 4 1 1 2 ..., from 0
+    size, seq = 1, 0
+    while size < i + 1:
+        seq += 1
+        size = 2 * size + 1
+    while size - 1 != i:
+        size = (size - 1) >> 1
+        seq -= 1
+        i = i % size
+    return 2 ** seq
+
+
+def find_model(expr):
+    """Returns an assignment of TRUE or FALSE to every variable of expr that
+    makes it TRUE, or None if expr is unsatisfiable. No truth table is built,
+    the expression is encoded in CNF and given to a Solver.
+
+    Examples:
+        >>> a, b = Expression(' ', 'a'), Expression(' ', 'b')
+        >>> find_model(Expression('&', a, Expression('~', b)))
+        {'a': 'T', 'b': 'F'}
+        >>> print(find_model(Expression('&', a, Expression('~', a))))
+        None
+    """
+    cnf = Tseitin(expr)
+    solver = Solver(cnf.num_vars)
+    for clause in cnf.clauses():
+        solver.add_clause(clause)
+    model = solver.solve()
+    if model is None:
+        return
+    return {name: TRUE if model[var] else FALSE
+            for name, var in cnf.variables.items()}
+
+
+def is_satisfiable(expr):
+    """Returns whether some assignment makes expr TRUE.
+
+    >>> is_satisfiable(Expression('^', Expression(' ', 'a'), 'a'))
+    False
+    """
+    return find_model(expr) is not None
+
+
+def is_tautology(expr):
+    """Returns whether every assignment makes expr TRUE.
+
+    >>> is_tautology(Expression('|', Expression(' ', 'a'),
+    ...                         Expression('~', Expression(' ', 'a'))))
+    True
+    """
+    return not is_satisfiable(Expression(NOT, expr))
+
+
+def equivalent(expr1, expr2):
+    """Returns whether expr1 and expr2 have the same value for every
+    assignment.
+
+    >>> a, b = Expression(' ', 'a'), Expression(' ', 'b')
+    >>> equivalent(Expression('=>', a, b),
+    ...            Expression('|', Expression('~', a), b))
+    True
+    >>> equivalent(Expression('=>', a, b), Expression('=>', b, a))
+    False
+    """
+    return not is_satisfiable(Expression(XOR, expr1, expr2))
@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+
+import json
+import mmap
+import struct
+from boolean import CONSTANTS, TRUE, FALSE
+from truthtable import CHUNK_BITS, popcount
+
+__all__ = ['write_table', 'TableFile']
+
+# Start of every table file, with the version of the format
+MAGIC = b'BLTT\x01'
+
+# Length of the header, after MAGIC
+HEADER_SIZE = struct.Struct('<I')
+
+# Bytes of the columns read at once when scanning them
+BLOCK_SIZE = 1 << 16
+
+
+def write_table(table, path, backend='int', bits=CHUNK_BITS, workers=None):
+    """Writes the TruthTable table to the file at path as bit-packed columns.
+
+    The file starts with MAGIC and a JSON header giving the variables, the
+    head as strings and the number of rows, padded to 8 bytes. Then comes
+    the column of each formula of the head, in order, with bit r of the
+    column, byte r // 8 and bit r % 8 in it, set if the formula is TRUE at
+    row r. The columns are computed by iter_columns with the arguments
+    backend, bits and workers and written chunk by chunk, so the table never
+    needs to fit in memory.
+    """
+    num_vars = len(table.vars)
+    rows = 2 ** num_vars
+    # chunks must be whole bytes, i.e. at least 8 rows
+    bits = max(min(bits, num_vars), min(3, num_vars))
+    if table.chunk_bits(bits, workers) < min(3, num_vars):
+        workers = None
+    bits = table.chunk_bits(bits, workers)
+    head = [str(formula) for formula in table.head]
+
+    header = json.dumps({'vars': list(table.vars), 'head': head,
+                         'rows': rows}).encode('utf-8')
+    start = len(MAGIC) + HEADER_SIZE.size + len(header)
+    start += -start % 8
+    column_size = (rows + 7) // 8
+    chunk_size = (2 ** bits + 7) // 8
+
+    with open(path, 'wb') as file:
+        file.write(MAGIC)
+        file.write(HEADER_SIZE.pack(len(header)))
+        file.write(header)
+        file.truncate(start + len(head) * column_size)
+        for chunk, columns in enumerate(table.iter_columns(backend, bits,
+                                                           workers)):
+            for index, column in enumerate(columns):
+                file.seek(start + index * column_size + chunk * chunk_size)
+                file.write(_pack(column, chunk_size))
+
+
+def _pack(column, size):
+    if isinstance(column, int):
+        return column.to_bytes(size, 'little')
+    from truthtable import _numpy
+    return _numpy().packbits(column, bitorder='little').tobytes()
+
+
+class TableFile(object):
+    """A truth table written by write_table, read through mmap.
+
+    Only the header is read when opening, the values are read from the
+    mapped file when asked for, so the table can be larger than the memory.
+
+    Data defined:
+        vars: the variables of the table
+        head: the formulas of the table, as strings
+        rows: the number of rows
+
+    Examples:
+        >>> import os, tempfile
+        >>> from bool_parser import parse
+        >>> from truthtable import TruthTable
+        >>> path = os.path.join(tempfile.mkdtemp(), 'table')
+        >>> write_table(TruthTable(parse('a & ~b | c')), path)
+        >>> with TableFile(path) as table:
+        ...     print(table.head, table.rows)
+        ...     print(table.row(1), table.value(-1, 1))
+        ...     print(list(table.true_rows()), table.count())
+        ['a', 'b', '~b', '(a & ~b)', 'c', '((a & ~b) | c)'] 8
+        ['T', 'T', 'F', 'F', 'F', 'F'] F
+        [0, 2, 3, 4, 6] 5
+        >>> table.assignment(3)
+        {'a': 'T', 'b': 'F', 'c': 'F'}
+    """
+
+    def __init__(self, path):
+        with open(path, 'rb') as file:
+            if file.read(len(MAGIC)) != MAGIC:
+                raise ValueError('not a truth table file: {}'.format(path))
+            size, = HEADER_SIZE.unpack(file.read(HEADER_SIZE.size))
+            header = json.loads(file.read(size).decode('utf-8'))
+            self.vars = header['vars']
+            self.head = header['head']
+            self.rows = header['rows']
+            self._start = len(MAGIC) + HEADER_SIZE.size + size
+            self._start += -self._start % 8
+            self._column_size = (self.rows + 7) // 8
+            self._map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        """Closes the table. The file stays mapped until the views returned
+        by column are released, if some are still in use. Closing a closed
+        table does nothing.
+
+        >>> import os, tempfile
+        >>> from bool_parser import parse
+        >>> from truthtable import TruthTable
+        >>> path = os.path.join(tempfile.mkdtemp(), 'table')
+        >>> write_table(TruthTable(parse('a')), path)
+        >>> table = TableFile(path)
+        >>> table.close()
+        >>> table.close()
+        >>> with TableFile(path) as table:
+        ...     table.close()
+        """
+        if self._map is None:
+            return
+        try:
+            self._map.close()
+        except BufferError:
+            # closed by the mmap object itself when the last view goes
+            pass
+        self._map = None
+
+    def _offset(self, index):
+        # Start of the column of the formula at index of the head
+        if not -len(self.head) <= index < len(self.head):
+            raise IndexError('column index out of range: {}'.format(index))
+        return self._start + (index % len(self.head)) * self._column_size
+
+    def _check_row(self, row):
+        if not 0 <= row < self.rows:
+            raise IndexError('row out of range: {}'.format(row))
+
+    def column(self, index):
+        """Returns the bytes of the column of the formula at index, as a
+        memoryview of the mapped file, without copying them. The view stays
+        valid after the table is closed, and keeps the file mapped until it
+        is released.
+
+        >>> import os, tempfile
+        >>> from bool_parser import parse
+        >>> from truthtable import TruthTable
+        >>> path = os.path.join(tempfile.mkdtemp(), 'table')
+        >>> write_table(TruthTable(parse('a | b')), path)
+        >>> with TableFile(path) as table:
+        ...     column = table.column(-1)
+        >>> bytes(column)
+        b'\\x07'
+        >>> column.release()
+        """
+        offset = self._offset(index)
+        return memoryview(self._map)[offset:offset + self._column_size]
+
+    def value(self, index, row):
+        """Returns the value, TRUE or FALSE, of the formula at index of the
+        head at row."""
+        self._check_row(row)
+        byte = self._map[self._offset(index) + row // 8]
+        return TRUE if byte >> row % 8 & 1 else FALSE
+
+    def row(self, row):
+        """Returns the values of every formula at row."""
+        return [self.value(index, row) for index in range(len(self.head))]
+
+    def assignment(self, row):
+        """Returns the values of the variables at row, as a dictionary."""
+        self._check_row(row)
+        num_vars = len(self.vars)
+        return {var: CONSTANTS[row >> (num_vars - i - 1) & 1]
+                for i, var in enumerate(self.vars)}
+
+    def _blocks(self, index, kind='int'):
+        # Yields the number of the first row and the value of each block of
+        # the column as an integer, or as bytes. Blocks of zeros are skipped.
+        offset = self._offset(index)
+        end = offset + self._column_size
+        for start in range(offset, end, BLOCK_SIZE):
+            block = self._map[start:min(start + BLOCK_SIZE, end)]
+            if block.count(0) == len(block):
+                continue
+            yield (start - offset) * 8, (int.from_bytes(block, 'little')
+                                         if kind == 'int' else block)
+
+    def true_rows(self, index=-1):
+        """Yields the rows at which the formula at index of the head, the
+        whole expression by default, is TRUE, in increasing order."""
+        for first, block in self._blocks(index, 'bytes'):
+            for start in range(0, len(block), 8):
+                word = int.from_bytes(block[start:start + 8], 'little')
+                while word:
+                    bit = word & -word
+                    yield first + start * 8 + bit.bit_length() - 1
+                    word ^= bit
+
+    def count(self, index=-1):
+        """Returns the number of rows at which the formula at index is
+        TRUE."""
+        return sum(popcount(value) for first, value in self._blocks(index))
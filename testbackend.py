@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+
+import random
+from bool_parser import parse
+from benchmark import random_expression
+from truthtable import TruthTable
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# Formulas compared, each with the given number of variables
+FORMULAS = ['a', '~a', 'T | a', 'a <=> F', 'a & ~b | c',
+            '(a => b) ^ (c <=> ~d) & (e | F)']
+VARIABLES = (1, 3, 6, 9)
+
+
+def report(passed, name, detail):
+    if passed:
+        print('Passed:', name, detail)
+    else:
+        print('Failed:', name, detail)
+
+
+def testNumpyBackend():
+    # The numpy backend gives the same tables and counts as the int one,
+    # with the rows in one chunk or split into several.
+    if numpy is None:
+        print('Skipped: numpy backend, numpy is not installed')
+        return
+
+    rng = random.Random(0)
+    exprs = [parse(string) for string in FORMULAS]
+    exprs.extend(random_expression(20, variables=count, rng=rng)
+                 for count in VARIABLES)
+    for expr in exprs:
+        table = TruthTable(expr)
+        passed = table.generate(backend='numpy') == table.generate()
+        for bits in (0, 2, 20):
+            passed = passed and (table.counts(backend='numpy', bits=bits) ==
+                                 table.counts(bits=bits))
+        report(passed, 'numpy backend', str(expr))
+
+
+if __name__ == '__main__':
+    testNumpyBackend()
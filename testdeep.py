@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+
+import gc
+import time
+from bool_parser import parse
+from truthtable import TruthTable
+
+SIZE = 100000
+
+
+def nested(n):
+    # n operators, each one nested inside parentheses: ((a & b) & b)...
+    return '(' * n + 'a' + ' & b)' * n
+
+
+def chained(n):
+    # n operators without any parentheses: a & b & a & b...
+    return ' & '.join(['a', 'b'] * (n // 2) + ['a'])
+
+
+def report(passed, name, detail):
+    if passed:
+        print('Passed:', name, detail)
+    else:
+        print('Failed:', name, detail)
+
+
+def testDeepExpressions():
+    for name, make in (('nested', nested), ('chained', chained)):
+        string = make(SIZE)
+        try:
+            expr = parse(string)
+            table = TruthTable(expr).generate()
+            passed = (str(expr) == string or make is chained) and (
+                    len(expr.evaluation_order()) == 2 * SIZE + 1 and
+                    expr.sexpr().count('(') == SIZE and
+                    [row[-1] for row in table[1:]] == ['T', 'F', 'F', 'F'])
+            detail = ''
+        except RecursionError as ex:
+            passed = False
+            detail = repr(ex)
+        report(passed, name, '{} operators {}'.format(SIZE, detail))
+
+
+def testLinearTime():
+    # Every stage should take about 4 times longer for 4 times the operators.
+    # A quadratic one would take 16 times longer.
+    stages = [
+        ('parse', parse),
+        ('str', str),
+        ('sexpr', lambda expr: expr.sexpr()),
+        ('evaluation_order', lambda expr: expr.evaluation_order()),
+        ('TruthTable', lambda expr: TruthTable(expr).generate())]
+
+    small, large = SIZE // 4, SIZE
+    inputs = {small: nested(small), large: nested(large)}
+    for name, stage in stages:
+        times = {}
+        for size in (small, large):
+            times[size] = float('inf')
+            for i in range(3):
+                # like timeit, keep the garbage collector out of the timing
+                gc.disable()
+                start = time.perf_counter()
+                result = stage(inputs[size])
+                times[size] = min(times[size], time.perf_counter() - start)
+                gc.enable()
+            if name == 'parse':
+                inputs[size] = result
+
+        ratio = times[large] / max(times[small], 1e-6)
+        report(ratio < 8, name, '{:.2f}s for {} operators, {:.1f} times '
+               '{} operators'.format(times[large], large, ratio, small))
+
+
+if __name__ == '__main__':
+    testDeepExpressions()
+    testLinearTime()
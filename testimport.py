@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+
+import os
+import subprocess
+import sys
+
+# Seconds that importing the interpreter may take
+BUDGET = 0.1
+
+# Modules only imported when they are used
+LAZY = ('pyparsing', 'numpy', 'concurrent.futures', 'readline')
+
+MEASURE = '''
+import sys, time
+start = time.perf_counter()
+import interpreter
+print(time.perf_counter() - start)
+print(' '.join(name for name in {!r} if name in sys.modules))
+'''.format(LAZY)
+
+
+def report(passed, name, detail):
+    if passed:
+        print('Passed:', name, detail)
+    else:
+        print('Failed:', name, detail)
+
+
+def run(*args):
+    # Runs a new interpreter in the directory of this file, so that nothing
+    # is imported already.
+    return subprocess.run([sys.executable] + list(args), capture_output=True,
+            text=True, cwd=os.path.dirname(os.path.abspath(__file__)))
+
+
+def testImportTime():
+    times = []
+    for i in range(3):
+        lines = run('-c', MEASURE).stdout.split('\n')
+        times.append(float(lines[0]))
+        loaded = lines[1]
+    best = min(times)
+    report(best < BUDGET, 'import time', '{:.3f}s, budget {}s'.format(best,
+           BUDGET))
+    report(not loaded, 'lazy imports', loaded or 'none of ' + ', '.join(LAZY))
+
+
+def testOneShot():
+    result = run('interpreter.py', '-c', 'a & ~a')
+    rows = [line for line in result.stdout.split('\n') if line.startswith('|')]
+    report(result.returncode == 0 and len(rows) == 3, '-c expression',
+           '{} rows'.format(len(rows) - 1))
+    result = run('interpreter.py', '-c', 'a & (')
+    report(result.returncode == 1, '-c invalid expression',
+           result.stdout.strip())
+    for line in (':unknown', ':sat a, b'):
+        result = run('interpreter.py', '-c', line)
+        report(result.returncode == 1, '-c invalid command',
+               result.stdout.strip())
+
+
+if __name__ == '__main__':
+    testImportTime()
+    testOneShot()
@@ -1,8 +1,18 @@
 #!/usr/bin/env python3
 
-from boolean import bool_funcs_dict, CONSTANTS
+from boolean import bitwise_funcs_dict, BIT_CONSTANTS, CONSTANTS, TRUE, FALSE
+from collections import deque
+from functools import lru_cache
 from itertools import product
-from expression import Expression, simulate
+from expression import Expression, DAG, compile_expression
+
+# numpy is only imported by _numpy, when the numpy backend is first used, as
+# it takes longer to import than the rest of the package.
+numpy = None
+
+# Number of variables that vary within a chunk, i.e. chunks of 2 ** CHUNK_BITS
+# rows are evaluated at once when iterating over the table.
+CHUNK_BITS = 20
 
 
 class TruthTable:
@@ -11,22 +21,18 @@ class TruthTable:
     Data defined:
         vars: Identifiers in the string
         var_combination: A tuple of dictionary of the possilbe combination of
-            the truth value
+            the truth value. Built on every access, iter_combinations yields
+            the same dictionaries one at a time.
     """
 
     def __init__(self, expr):
         self._gen_order(expr)
         self._find_variables()
-        self._make_combination()
 
     def _gen_order(self, expr):
         """Remove redundant expression from the list of statements."""
-        order = expr.evaluation_order()
-        new_order = []
-        for i in order:
-            if i not in new_order:
-                new_order.append(i)
-        self.__order = new_order
+        dag = DAG()
+        self.__order = dag.evaluation_order(dag.add(expr))
 
     def _find_variables(self):
         # Find all the identifier in the expression. Used in order to determine
@@ -46,23 +52,149 @@ class TruthTable:
         vars.sort()
         self.vars = tuple(vars)
 
-    def _make_combination(self):
-    # Make all possible combinations of true and false using the given set of
-    # variables.
+    def iter_combinations(self):
+        """Yields a dictionary mapping each variable to its value for every
+        row of the table, in row order.
+
+        Examples:
+            >>> table = TruthTable(Expression('&', 'a', 'b'))
+            >>> [sorted(m.items()) for m in table.iter_combinations()]
+            ...  # doctest: +NORMALIZE_WHITESPACE
+            [[('a', 'T'), ('b', 'T')], [('a', 'T'), ('b', 'F')],
+             [('a', 'F'), ('b', 'T')], [('a', 'F'), ('b', 'F')]]
+        """
+        for values in product(CONSTANTS, repeat=len(self.vars)):
+            yield dict(zip(self.vars, values))
+
+    @property
+    def var_combination(self):
+        return tuple(self.iter_combinations())
+
+    @property
+    def head(self):
+        """The formulas of the table, in the order of its columns."""
+        return list(self.__order)
+
+    def columns(self, backend='int'):
+        """Evaluates every formula of the table at once. Returns a list of the
+        columns in the same order as the head of the table.
+
+        backend - 'int' packs each column into an integer whose bit r is set
+            when the formula is TRUE at row r. 'numpy' returns arrays of
+            booleans instead and requires numpy.
+
+        Each formula costs one bitwise operation regardless of the number of
+        rows.
+
+        Examples:
+            >>> TruthTable(Expression('&', 'a', 'b')).columns()
+            [3, 5, 1]
+            >>> TruthTable(Expression('=>', 'a', 'b')).columns()
+            [3, 5, 13]
+        """
+        return self._evaluate_chunk(0, len(self.vars), backend)
+
+    def iter_columns(self, backend='int', bits=CHUNK_BITS, workers=None):
+        """Like columns but evaluates the rows in chunks of 2 ** bits rows,
+        yielding the columns of each chunk in row order. Only one chunk is
+        held in memory at a time, so the number of variables is not limited
+        by the memory available.
+
+        workers - if given, the chunks are evaluated by that many processes.
+            The chunks are made smaller if needed so that every process
+            gets several of them. They are still yielded in row order.
+
+        Examples:
+            >>> table = TruthTable(Expression('&', 'a', 'b'))
+            >>> list(table.iter_columns(bits=1))
+            [[3, 1, 1], [0, 1, 0]]
+            >>> list(table.iter_columns(workers=2))
+            [[1, 1, 1], [1, 0, 0], [0, 1, 0], [0, 0, 0]]
+        """
+        bits = self.chunk_bits(bits, workers)
+        chunks = range(2 ** (len(self.vars) - bits))
+        if not workers:
+            for chunk in chunks:
+                yield self._evaluate_chunk(chunk, bits, backend)
+            return
+
+        from concurrent.futures import ProcessPoolExecutor
+
+        # Each process receives the table once, the tasks only carry the
+        # chunk number. At most a few chunks per process are pending so that
+        # the memory stays bounded while the results are consumed in order.
+        with ProcessPoolExecutor(workers, initializer=_init_worker,
+                initargs=(self,)) as executor:
+            pending = deque()
+            for chunk in chunks:
+                pending.append(executor.submit(_evaluate_chunk, chunk, bits,
+                    backend))
+                if len(pending) >= 2 * workers:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
+
+    def chunk_bits(self, bits=CHUNK_BITS, workers=None):
+        """Returns the number of variables varying inside a chunk of
+        iter_columns given bits and workers, each chunk having 2 ** that
+        many rows. With workers, enough leading variables stay fixed to make
+        about four chunks each.
+
+        >>> table = TruthTable(Expression('&', 'a', 'b'))
+        >>> table.chunk_bits(), table.chunk_bits(workers=2)
+        (2, 0)
+        """
+        bits = min(bits, len(self.vars))
+        if workers:
+            shard_bits = (4 * workers - 1).bit_length()
+            bits = min(bits, max(0, len(self.vars) - shard_bits))
+        return bits
+
+    def counts(self, backend='int', bits=CHUNK_BITS, workers=None):
+        """Returns the number of rows in which each formula is TRUE.
+
+        Examples:
+            >>> TruthTable(Expression('|', 'a', 'b')).counts()
+            [2, 2, 3]
+        """
+        totals = [0] * len(self.__order)
+        for columns in self.iter_columns(backend, bits, workers):
+            for i, column in enumerate(columns):
+                if backend == 'int':
+                    totals[i] += popcount(column)
+                else:
+                    totals[i] += int(_numpy().count_nonzero(column))
+        return totals
+
+    def _evaluate_chunk(self, chunk, bits, backend):
+        # The first variables are constant within a chunk, the variables in
+        # the last bits positions take every combination.
+        fixed = len(self.vars) - bits
+        if backend == 'int':
+            constants = BIT_CONSTANTS
+            variable_column = _variable_column
+            mask = (1 << 2 ** bits) - 1
+            finish = lambda value: value & mask
+        elif backend == 'numpy':
+            numpy = _numpy()
+            constants = {TRUE: numpy.True_, FALSE: numpy.False_}
+            variable_column = _array_column
+            finish = lambda value: numpy.broadcast_to(value, 2 ** bits)
+        else:
+            raise ValueError('unknown backend: {}'.format(backend))
 
-        var_combination = []
-        no_of_combination = len(self.vars)
-        cartesian_product = product(CONSTANTS, repeat=no_of_combination)
+        mappings = dict(constants)
+        for index, variable in enumerate(self.vars):
+            if index < fixed:
+                bit = chunk >> (fixed - index - 1) & 1
+                mappings[variable] = constants[CONSTANTS[bit]]
+            else:
+                mappings[variable] = variable_column(index - fixed, bits)
 
-        # Map all those values to their respective variable
-        for values in cartesian_product:
-            mapping = {}
-            for variable, value in zip(self.vars, values):
-                mapping[variable] = value
-            var_combination.append(mapping)
-        self.var_combination = tuple(var_combination)
+        evaluate = compile_expression(self.__order, bitwise_funcs_dict)
+        return [finish(value) for value in evaluate(mappings)]
 
-    def generate(self):
+    def generate(self, backend='int', workers=None):
         """Generates the truth table. Returns a list whose first element is a
         the formula and the rest are their corresponding values.
 
@@ -81,67 +213,161 @@ class TruthTable:
              ['T', 'F', 'F'],
              ['F', 'T', 'F'],
              ['F', 'F', 'F']]
+            >>> TruthTable(Expression('|', 'T', 'F')).generate()
+            ...  # doctest: +NORMALIZE_WHITESPACE
+            [['T', 'F', Expression(oper='|', arg1='T', arg2='F')],
+             ['T', 'F', 'T']]
         """
-        truth_table = []
-
-        if len(self.var_combination):
-            head = []
-            truth_table.append(head)
-            for mapping in self.var_combination:
-                row = []
-                for formula, value in zip(self.__order, simulate(self.__order,
-                    mapping, bool_funcs_dict)):
-                    if formula not in head:
-                        head.append(formula)
-                    row.append(value)
-                truth_table.append(row)
-        else:
-            for formula, value in zip(self.__order, simulate(self.__order,
-                mapping, bool_funcs_dict)):
-                row.append(value)
-                truth_table.append(row)
-
+        truth_table = [list(self.__order)]
+        truth_table.extend(self.iter_rows(backend, workers=workers))
         return truth_table
 
-    def display_table(self):
-        """Display table in the console"""
-        truth_table = self.generate()
-        head = truth_table[0]
-        truth_table[0:1] = []
-        col_len = []
+    def iter_rows(self, backend='int', bits=CHUNK_BITS, workers=None):
+        """Yields the rows of the truth table, without the head, as soon as
+        they are computed. At most one chunk of 2 ** bits rows is held in
+        memory at a time.
+
+        Examples:
+            >>> table = TruthTable(Expression('|', 'a', 'b'))
+            >>> for row in table.iter_rows(bits=1):
+            ...     print(row)
+            ['T', 'T', 'T']
+            ['T', 'F', 'T']
+            ['F', 'T', 'T']
+            ['F', 'F', 'F']
+        """
+        rows = 2 ** self.chunk_bits(bits, workers)
+        for columns in self.iter_columns(backend, bits, workers):
+            yield from _decode(columns, rows)
 
-        for i, j in enumerate(head[:]):
-            head[i] = str(j)
-            col_len.append(len(head[i]) + 2)
+    def display_table(self, backend='int', workers=None):
+        """Display table in the console. Rows are printed as they are
+        computed instead of after the whole table is generated."""
+        self.render(backend=backend, workers=workers)
 
-        self._print_row(head, col_len, True)
-        for row in truth_table:
-            self._print_row(row, col_len)
+    def render(self, file=None, format='box', columns=None, backend='int',
+            workers=None):
+        """Writes the table to file, sys.stdout by default, in one of the
+        formats of render.render, as the rows are computed.
 
-    def _print_row(self, row, col_len, upper=False):
-        """Print the row of the table and border it.
+        columns - 'result' to write only the variables and the whole
+            formula, or the indices of the columns to write, in the order of
+            the head. All of them by default.
 
-        row - an iterable of fixed length
-        col_len - the width of each cell
-        upper - determine whether the upper border will be printed.
-            Default is False.
+        Examples:
+            >>> table = TruthTable(Expression('|', Expression('~', 'a'), 'b'))
+            >>> table.render(format='csv', columns='result')
+            a,b,(~a | b)
+            T,T,T
+            T,F,F
+            F,T,T
+            F,F,T
+            >>> TruthTable(Expression(' ', 'a')).render(format='tf',
+            ...                                         columns='result')
+            T
+            F
         """
+        from render import render
+
+        if columns == 'result':
+            columns = [i for i, formula in enumerate(self.__order)
+                       if self._is_variable(formula)]
+            if len(self.__order) - 1 not in columns:
+                columns.append(len(self.__order) - 1)
+        render(self.__order, self.iter_rows(backend, workers=workers), file,
+               format, columns)
+
+    def save(self, path, backend='int', bits=CHUNK_BITS, workers=None):
+        """Writes the table to a bit-packed binary file at path, which
+        tablefile.TableFile opens for random access. See
+        tablefile.write_table."""
+        from tablefile import write_table
+
+        write_table(self, path, backend, bits, workers)
+
+    @staticmethod
+    def _is_variable(formula):
+        if isinstance(formula, Expression):
+            return formula.is_leaf() and formula.arg1 not in CONSTANTS
+        return formula not in CONSTANTS
+
+
+def _numpy():
+    global numpy
+    if numpy is None:
+        try:
+            import numpy as module
+        except ImportError:
+            raise ImportError('the numpy backend requires numpy') from None
+        numpy = module
+    return numpy
+
+
+# The table evaluated by the current worker process, see iter_columns.
+_worker_table = None
+
+
+def _init_worker(table):
+    global _worker_table
+    _worker_table = table
+
+
+def _evaluate_chunk(chunk, bits, backend):
+    return _worker_table._evaluate_chunk(chunk, bits, backend)
+
+
+def popcount(column):
+    """Returns the number of rows at which column, an integer as given by
+    the int backend, is TRUE: the number of its bits set.
+
+    >>> popcount(0b1011)
+    3
+    """
+    try:
+        return column.bit_count()
+    except AttributeError:
+        # int.bit_count is new in Python 3.10
+        return bin(column).count('1')
+
+
+@lru_cache(maxsize=64)
+def _variable_column(index, count):
+    # Bit mask of the rows where the index-th of count variables is TRUE. The
+    # first variable changes the slowest, the same as itertools.product over
+    # CONSTANTS, so it is TRUE in the first half of the rows.
+    block = 2 ** (count - index - 1)
+    rows = 2 ** count
+    column = (1 << block) - 1
+    width = 2 * block
+    while width < rows:
+        column |= column << width
+        width *= 2
+    return column
+
+
+@lru_cache(maxsize=64)
+def _array_column(index, count):
+    # Same as _variable_column for the numpy backend.
+    rows = numpy.arange(2 ** count, dtype=numpy.uint64)
+    column = (rows >> numpy.uint64(count - index - 1)) & numpy.uint64(1) == 0
+    column.flags.writeable = False
+    return column
+
+
+def _decode(columns, rows):
+    # Unpack the columns into rows of TRUE and FALSE. Only done when the
+    # values are needed as strings, e.g. for displaying.
+    if columns and not isinstance(columns[0], int):
+        cells = [_numpy().where(column, TRUE, FALSE).tolist()
+                 for column in columns]
+        for row in zip(*cells):
+            yield list(row)
+        return
 
-        if upper:
-            print('+', end='')
-            for i in col_len:
-                print('-' * i, end='+')
-            print()
-
-        print('|', end='')
-        for col, length in zip(row, col_len):
-            print(str(col).center(length), end='|')
-
-        print()
-        print('+', end='')
-        for i in col_len:
-            print('-' * i, end='+')
-        print()
+    values = {'1': TRUE, '0': FALSE}
+    bits = [format(column, '0{}b'.format(rows))[::-1] for column in columns]
+    for cells in zip(*bits):
+        yield [values[cell] for cell in cells]
 
 if __name__ == '__main__':
     import doctest